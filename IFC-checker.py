@@ -1,4 +1,18 @@
+import argparse
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import ifcopenshell
+import ifcopenshell.guid
+import numpy as np
 
 def clean_ifc(ifc_file_path, printout=False):
     """
@@ -14,38 +28,10 @@ def clean_ifc(ifc_file_path, printout=False):
     """
     try:
         ifc_model = ifcopenshell.open(ifc_file_path)
-        new_ifc_model = ifcopenshell.file()
-
-        # header
-        for entity in ifc_model.by_type('IfcProject'):
-            new_ifc_model.createIfcProject(
-                entity.GlobalId, entity.OwnerHistory, entity.Name, entity.Description,
-                entity.ObjectType, entity.LongName, entity.Phase
-            )
-
-        # Typen (anschiessend alle)
-        types_to_keep = [
-            'IfcWall', 'IfcDoor', 'IfcWindow', 'IfcSlab', 'IfcColumn', 'IfcBeam',
-            'IfcRoof', 'IfcStair', 'IfcRamp', 'IfcSpace', 'IfcZone', 'IfcCovering'
-        ]
-
-        added_types = {type_name: False for type_name in types_to_keep}
-
-        for type_name in types_to_keep:
-            instances = ifc_model.by_type(type_name)
-            if instances:
-                instance = instances[0]
-                new_instance = new_ifc_model.add(instance)
-                added_types[type_name] = True
-
-                # alle attribute der zu behaltenden Instanz hinzugügen.
-                for attribute in instance.__dict__:
-                    setattr(new_instance, attribute, getattr(instance, attribute))
-                for pset in ifcopenshell.util.element.get_psets(instance):
-                    ifcopenshell.util.element.add_pset(new_ifc_model, new_instance, pset)
-        
+        new_ifc_model, stats = clean_ifc_model(ifc_model)
         if printout:
-            print(f"IFC bereinigt, entahltene typen: {list(added_types.keys())}")
+            print(f"IFC bereinigt, enthaltene typen: {stats['types']}")
+            print(f"{stats['entities_copied']} Entitäten in {stats['seconds']:.3f}s kopiert")
         return new_ifc_model
 
     except FileNotFoundError:
@@ -56,22 +42,682 @@ def clean_ifc(ifc_file_path, printout=False):
         return ifcopenshell.file()
 
 
-def get_element_types(ifc_path, printout=False) -> list:
+def clean_ifc_model(ifc_model):
+    """
+    Kern von clean_ifc: kopiert das Projekt und von jedem IfcProduct-Typ (plus IfcZone) die erste Instanz.
+
+    Jede Instanz wird mit allen vorwärts referenzierten Entitäten (Placement, Geometrie, OwnerHistory) kopiert,
+    dazu ihre Psets und Typobjekte über neue IfcRelDefinesByProperties / IfcRelDefinesByType, die nur noch
+    die kopierten Instanzen enthalten. Entitäten, die mehrere Instanzen teilen, werden genau einmal kopiert.
+
+    Parameters:
+    ifc_model (ifcopenshell.file): geladenes IFC-Modell
+
+    Returns:
+    tuple: (ifcopenshell.file neues Modell, dict mit types, entities_copied und seconds).
+    """
+    start = time.perf_counter()
+    new_ifc_model = ifcopenshell.file(schema=ifc_model.schema)
+    copied = {}    # id im Original -> Instanz im neuen Modell
+    new_rels = {}  # id der Original-Relation -> Liste der neuen Relationen
+
+    # header
+    for project in ifc_model.by_type('IfcProject'):
+        _copy_closure(project, new_ifc_model, copied)
+
+    # IfcZone ist kein IfcProduct, wurde aber schon immer mitgenommen
+    representatives = {}
+    for instance in ifc_model.by_type('IfcProduct') + ifc_model.by_type('IfcZone'):
+        representatives.setdefault(instance.is_a(), instance)
+
+    for instance in representatives.values():
+        new_instance = _copy_closure(instance, new_ifc_model, copied)
+        for rel in _definition_rels(instance):
+            if rel.id() in new_rels:
+                for new_rel in new_rels[rel.id()]:
+                    new_rel.RelatedObjects = new_rel.RelatedObjects + (new_instance,)
+                continue
+            attributes = rel.get_info(include_identifier=False)
+            del attributes['type']
+            del attributes['RelatedObjects']
+            for reference in _references(attributes.values()):
+                _copy_closure(reference, new_ifc_model, copied)
+            new_rels[rel.id()] = [new_ifc_model.create_entity(rel.is_a(), **rel_attributes, RelatedObjects=[new_instance])
+                                  for rel_attributes in _split_definition_set(attributes, new_ifc_model, copied)]
+
+    stats = {
+        "types": sorted(representatives),
+        "entities_copied": len(copied) + sum(len(rels) for rels in new_rels.values()),
+        "seconds": time.perf_counter() - start
+    }
+    return new_ifc_model, stats
+
+
+def _definition_rels(instance):
+    """ Pset- und Typ-Relationen einer Instanz (IFC2X3: IsDefinedBy, IFC4: zusätzlich IsTypedBy). """
+    rels = []
+    for inverse in ('IsDefinedBy', 'IsTypedBy'):
+        for rel in getattr(instance, inverse, None) or ():
+            if rel.is_a('IfcRelDefinesByProperties') or rel.is_a('IfcRelDefinesByType'):
+                rels.append(rel)
+    return rels
+
+
+def _split_definition_set(attributes, new_ifc_model, copied):
+    """
+    Attribute der neuen Relation(en), mit den schon kopierten Entitäten. Ein IFC4 IfcPropertySetDefinitionSet
+    wird in eine Relation pro Pset aufgeteilt (gleiche Bedeutung), weil ifcopenshell beim Erzeugen eines
+    Definition-Sets abstürzt. Jede weitere Relation bekommt eine neue GlobalId.
+    """
+    definition = attributes.get('RelatingPropertyDefinition')
+    if not isinstance(definition, ifcopenshell.entity_instance) or definition.id():
+        return [{name: _copy_value(value, new_ifc_model, copied) for name, value in attributes.items()}]
+    split = []
+    for pset in definition.wrappedValue:
+        rel_attributes = dict(attributes, RelatingPropertyDefinition=pset)
+        if split:
+            rel_attributes['GlobalId'] = ifcopenshell.guid.new()
+        split.append({name: _copy_value(value, new_ifc_model, copied) for name, value in rel_attributes.items()})
+    return split
+
+
+def _copy_closure(root, new_ifc_model, copied):
+    """
+    Kopiert root mit allen vorwärts referenzierten Entitäten nach new_ifc_model.
+    Bereits kopierte Entitäten (copied) werden wiederverwendet. Iterativ, damit tief verschachtelte
+    Geometrie (z.B. IfcBooleanResult-Ketten) nicht an das Rekursionslimit stösst.
+    """
+    stack = [(root, False)]
+    while stack:
+        entity, references_done = stack.pop()
+        if entity.id() in copied:
+            continue
+        if not references_done:
+            stack.append((entity, True))
+            stack.extend((reference, False) for reference in _references(entity[i] for i in range(len(entity)))
+                         if reference.id() not in copied)
+            continue
+        values = [_copy_value(entity[i], new_ifc_model, copied) for i in range(len(entity))]
+        copied[entity.id()] = new_ifc_model.create_entity(entity.is_a(), *values)
+    return copied[root.id()]
+
+
+def _references(values):
+    """ Direkt referenzierte Entitäten (mit Instanz-Id) in einer Folge von Attributwerten. """
+    pending = list(values)
+    references = []
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (tuple, list)):
+            pending.extend(value)
+        elif isinstance(value, ifcopenshell.entity_instance):
+            if value.id():
+                references.append(value)
+            else:
+                # typisierte Werte ohne Id können Entitäten umhüllen (IfcPropertySetDefinitionSet)
+                pending.append(value.wrappedValue)
+    return references
+
+
+def _copy_value(value, new_ifc_model, copied):
+    """ Attributwert ins neue Modell übertragen; referenzierte Entitäten müssen schon kopiert sein. """
+    if isinstance(value, (tuple, list)):
+        return tuple(_copy_value(item, new_ifc_model, copied) for item in value)
+    if isinstance(value, ifcopenshell.entity_instance):
+        if value.id():
+            return copied[value.id()]
+        # typisierte Werte in Selects (z.B. IfcLabel) haben keine Id und werden neu erzeugt
+        return new_ifc_model.create_entity(value.is_a(), _copy_value(value.wrappedValue, new_ifc_model, copied))
+    return value
+
+
+class IfcPropertyIndex:
+    """
+    Index über Element-Typen, Psets und Property-Werte eines IFC-Modells.
+
+    Wird in einem einzigen Durchlauf über IsDefinedBy / IfcRelDefinesByProperties aufgebaut, damit die
+    Abfragefunktionen das Modell nicht bei jedem Aufruf neu öffnen müssen. Psets und Werte werden wie bei
+    by_type() auch unter allen Supertypen eines Elements abgelegt (IfcWallStandardCase zählt auch als IfcWall).
+
+    Parameters:
+    ifc_model (ifcopenshell.file): geladenes IFC-Modell, None ergibt einen leeren Index
+    """
+
+    def __init__(self, ifc_model=None):
+        self.schema = None
+        self.element_counts = {}   # entity_type -> Anzahl Instanzen
+        self.psets = {}            # entity_type -> set der Pset-Namen
+        self.pset_properties = {}  # pset_name -> Property-Namen des ersten Psets mit diesem Namen
+        self.values = {}           # (entity_type, pset_name, property_name) -> NominalValue
+        self._value_file = None    # hält die Werte am Leben, wenn sie aus Cache oder Pickle stammen
+        if ifc_model is not None:
+            self._build(ifc_model)
+
+    def __getstate__(self):
+        # NominalValues sind ifcopenshell-Instanzen und lassen sich nicht picklen
+        state = self.__dict__.copy()
+        state['values'] = {key: _encode_value(value) for key, value in self.values.items()}
+        state['_value_file'] = None
+        return state
+
+    def __setstate__(self, state):
+        values = state.pop('values')
+        self.__dict__.update(state)
+        self.values = {}
+        if values:
+            self._value_file = ifcopenshell.file(schema=self.schema)
+            for key, (value_type, value) in values.items():
+                self.values[key] = _decode_value(self._value_file, value_type, value)
+
+    def _build(self, ifc_model):
+        self.schema = ifc_model.schema
+        schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(ifc_model.schema)
+        type_chains = {}
+
+        for entity in ifc_model:
+            entity_type = entity.is_a()
+            self.element_counts[entity_type] = self.element_counts.get(entity_type, 0) + 1
+
+        for pset in ifc_model.by_type('IfcPropertySet'):
+            if pset.Name not in self.pset_properties:
+                self.pset_properties[pset.Name] = [prop.Name for prop in pset.HasProperties]
+
+        for entity in ifc_model.by_type('IfcObjectDefinition'):
+            if not hasattr(entity, 'IsDefinedBy'):
+                continue
+            entity_type = entity.is_a()
+            if entity_type not in type_chains:
+                type_chains[entity_type] = _type_chain(schema, entity_type)
+            for definition in entity.IsDefinedBy:
+                if not definition.is_a('IfcRelDefinesByProperties'):
+                    continue
+                psets = definition.RelatingPropertyDefinition
+                # IFC4 erlaubt hier auch ein IfcPropertySetDefinitionSet (Liste von Psets)
+                if not isinstance(psets, tuple) and psets.is_a('IfcPropertySetDefinitionSet'):
+                    psets = psets.wrappedValue
+                for pset in (psets if isinstance(psets, tuple) else (psets,)):
+                    self._add_pset(type_chains[entity_type], pset)
+
+    def _add_pset(self, type_chain, pset):
+        for type_name in type_chain:
+            self.psets.setdefault(type_name, set()).add(pset.Name)
+        if not pset.is_a('IfcPropertySet'):
+            return
+        for prop in pset.HasProperties:
+            if not hasattr(prop, 'NominalValue'):
+                continue
+            for type_name in type_chain:
+                self.values.setdefault((type_name, pset.Name, prop.Name), prop.NominalValue)
+
+    @property
+    def element_types(self):
+        return set(self.element_counts)
+
+
+def _type_chain(schema, entity_type):
+    """ Gibt den Typ und alle seine Supertypen zurück, z.B. IfcWallStandardCase, IfcWall, ..., IfcRoot. """
+    chain = []
+    declaration = schema.declaration_by_name(entity_type)
+    while declaration is not None:
+        chain.append(declaration.name())
+        declaration = declaration.supertype()
+    return chain
+
+
+def _as_index(ifc_source, streaming=False):
+    """
+    Macht aus einem Pfad, einem geladenen Modell oder einem bestehenden Index einen IfcPropertyIndex.
+    Pfade gehen über den IfcIndexCache, falls einer mit enable_ifc_cache() aktiviert wurde, oder mit
+    streaming=True über scan_ifc() (ohne Property-Werte).
+    """
+    if isinstance(ifc_source, IfcPropertyIndex):
+        return ifc_source
+    if isinstance(ifc_source, ifcopenshell.file):
+        return IfcPropertyIndex(ifc_source)
+    if streaming:
+        return scan_ifc(ifc_source)
+    if _ifc_cache is not None:
+        return _ifc_cache.load(ifc_source)
+    return IfcPropertyIndex(ifcopenshell.open(ifc_source))
+
+
+_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (hash TEXT PRIMARY KEY, schema TEXT NOT NULL,
+                                   size INTEGER NOT NULL, last_used REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL,
+                                  size INTEGER NOT NULL, hash TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS element_types (hash TEXT NOT NULL, entity_type TEXT NOT NULL, count INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS psets (hash TEXT NOT NULL, entity_type TEXT NOT NULL, pset TEXT);
+CREATE TABLE IF NOT EXISTS pset_properties (hash TEXT NOT NULL, pset TEXT, position INTEGER NOT NULL,
+                                            property TEXT);
+CREATE TABLE IF NOT EXISTS property_values (hash TEXT NOT NULL, entity_type TEXT NOT NULL, pset TEXT,
+                                            property TEXT, value_type TEXT, value TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS element_types_hash ON element_types (hash);
+CREATE INDEX IF NOT EXISTS psets_hash ON psets (hash);
+CREATE INDEX IF NOT EXISTS pset_properties_hash ON pset_properties (hash);
+CREATE INDEX IF NOT EXISTS property_values_hash ON property_values (hash);
+"""
+
+_CACHE_TABLES = ('element_types', 'psets', 'pset_properties', 'property_values')
+
+# erhöhen, wenn sich _CACHE_SCHEMA ändert; Dateien mit anderer Version werden geleert
+_CACHE_VERSION = 2
+
+
+class IfcIndexCache:
+    """
+    Persistenter Cache für die Typ-, Pset- und Property-Tabellen eines IfcPropertyIndex.
+
+    Die Tabellen liegen in einer SQLite-Datei, Schlüssel ist der SHA-256 des Dateiinhalts. Damit ein
+    unverändertes Modell nicht jedes Mal neu gehasht wird, merkt sich der Cache zusätzlich Pfad, Grösse
+    und mtime. Übersteigen die gespeicherten Tabellen max_bytes, werden die am längsten nicht mehr
+    benutzten Modelle entfernt (LRU).
+
+    Parameters:
+    cache_path (str): Pfad zur SQLite-Datei, Standard ist ~/.cache/myutils/ifc_index.sqlite
+    max_bytes (int): Grössenbudget für alle gespeicherten Modelle
+    """
+
+    def __init__(self, cache_path=None, max_bytes=1024 ** 3):
+        if cache_path is None:
+            cache_path = os.path.join(os.path.expanduser('~'), '.cache', 'myutils', 'ifc_index.sqlite')
+        cache_dir = os.path.dirname(os.path.abspath(cache_path))
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(cache_path)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != _CACHE_VERSION:
+            with self.conn:
+                for table in ('models', 'files') + _CACHE_TABLES:
+                    self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self.conn.executescript(_CACHE_SCHEMA)
+            self.conn.execute(f"PRAGMA user_version = {_CACHE_VERSION}")
+        else:
+            self.conn.executescript(_CACHE_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def load(self, ifc_path, printout=False):
+        """
+        Gibt den IfcPropertyIndex für ein IFC-file zurück, aus dem Cache oder frisch geparst.
+
+        Parameters:
+        ifc_path (str): Pfad zum IFC-file
+        printout (bool): Debug Informationen ausgeben oder nicht
+
+        Returns:
+        IfcPropertyIndex: Index des Modells.
+        """
+        start = time.perf_counter()
+        file_hash = self.file_hash(ifc_path)
+        index = self._read(file_hash)
+        if index is not None:
+            if printout:
+                print(f"IFC index cache hit for {ifc_path} ({time.perf_counter() - start:.3f}s)")
+            return index
+
+        ifc_model = ifcopenshell.open(ifc_path)
+        index = IfcPropertyIndex(ifc_model)
+        self._write(file_hash, ifc_model.schema, index)
+        self._evict()
+        if printout:
+            print(f"IFC index cache miss for {ifc_path} ({time.perf_counter() - start:.3f}s)")
+        return index
+
+    def file_hash(self, ifc_path):
+        """ SHA-256 des Dateiinhalts, bei unveränderter Grösse und mtime aus dem Cache. """
+        path = os.path.abspath(ifc_path)
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT hash FROM files WHERE path = ? AND mtime_ns = ? AND size = ?",
+                                (path, stat.st_mtime_ns, stat.st_size)).fetchone()
+        if row:
+            return row[0]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        file_hash = digest.hexdigest()
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                              (path, stat.st_mtime_ns, stat.st_size, file_hash))
+        return file_hash
+
+    def _read(self, file_hash):
+        row = self.conn.execute("SELECT schema FROM models WHERE hash = ?", (file_hash,)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE models SET last_used = ? WHERE hash = ?", (time.time(), file_hash))
+
+        index = IfcPropertyIndex()
+        index.schema = row[0]
+        # die Werte werden als IFC-Typinstanzen in einer leeren Datei neu erzeugt, damit sie sich
+        # gleich verhalten wie die NominalValues eines geladenen Modells
+        index._value_file = ifcopenshell.file(schema=row[0])
+        query = "SELECT {} FROM {} WHERE hash = ?"
+        for entity_type, count in self.conn.execute(query.format('entity_type, count', 'element_types'),
+                                                    (file_hash,)):
+            index.element_counts[entity_type] = count
+        for entity_type, pset in self.conn.execute(query.format('entity_type, pset', 'psets'), (file_hash,)):
+            index.psets.setdefault(entity_type, set()).add(pset)
+        for pset, prop in self.conn.execute(query.format('pset, property', 'pset_properties') +
+                                            " ORDER BY position", (file_hash,)):
+            index.pset_properties.setdefault(pset, []).append(prop)
+        for entity_type, pset, prop, value_type, value in self.conn.execute(
+                query.format('entity_type, pset, property, value_type, value', 'property_values'), (file_hash,)):
+            index.values[(entity_type, pset, prop)] = _decode_value(index._value_file, value_type, value)
+        return index
+
+    def _write(self, file_hash, schema, index):
+        element_types = [(file_hash, entity_type, count) for entity_type, count in index.element_counts.items()]
+        psets = [(file_hash, entity_type, pset)
+                 for entity_type, names in index.psets.items() for pset in names]
+        pset_properties = [(file_hash, pset, position, prop)
+                           for pset, props in index.pset_properties.items() for position, prop in enumerate(props)]
+        property_values = [(file_hash, entity_type, pset, prop) + _encode_value(value)
+                           for (entity_type, pset, prop), value in index.values.items()]
+        size = sum(len(str(field)) for rows in (element_types, psets, pset_properties, property_values)
+                   for row in rows for field in row[1:])
+
+        with self.conn:
+            self._delete(file_hash)
+            self.conn.execute("INSERT INTO models VALUES (?, ?, ?, ?)", (file_hash, schema, size, time.time()))
+            self.conn.executemany("INSERT INTO element_types VALUES (?, ?, ?)", element_types)
+            self.conn.executemany("INSERT INTO psets VALUES (?, ?, ?)", psets)
+            self.conn.executemany("INSERT INTO pset_properties VALUES (?, ?, ?, ?)", pset_properties)
+            self.conn.executemany("INSERT INTO property_values VALUES (?, ?, ?, ?, ?, ?)", property_values)
+
+    def _delete(self, file_hash):
+        self.conn.execute("DELETE FROM models WHERE hash = ?", (file_hash,))
+        self.conn.execute("DELETE FROM files WHERE hash = ?", (file_hash,))
+        for table in _CACHE_TABLES:
+            self.conn.execute(f"DELETE FROM {table} WHERE hash = ?", (file_hash,))
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM models").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        with self.conn:
+            for file_hash, size in self.conn.execute("SELECT hash, size FROM models ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._delete(file_hash)
+                total -= size
+
+
+def _encode_value(value):
+    """ Zerlegt einen NominalValue in (IFC-Typ, JSON-Wert) für den Cache. """
+    if isinstance(value, ifcopenshell.entity_instance):
+        return value.is_a(), json.dumps(value.wrappedValue)
+    return None, json.dumps(value)
+
+
+def _decode_value(ifc_file, value_type, value):
+    """ Gegenstück zu _encode_value, erzeugt die IFC-Typinstanz in ifc_file. """
+    value = json.loads(value)
+    if value_type is None:
+        return value
+    return ifc_file.create_entity(value_type, value)
+
+
+_ifc_cache = None
+
+
+def enable_ifc_cache(cache_path=None, max_bytes=1024 ** 3):
+    """
+    Aktiviert den persistenten IfcIndexCache für alle Funktionen, die einen Pfad entgegennehmen.
+
+    Parameters:
+    cache_path (str): Pfad zur SQLite-Datei, None für den Standardpfad
+    max_bytes (int): Grössenbudget des Caches
+
+    Returns:
+    IfcIndexCache: der aktivierte Cache.
+    """
+    global _ifc_cache
+    if _ifc_cache is not None:
+        _ifc_cache.close()
+    _ifc_cache = IfcIndexCache(cache_path, max_bytes)
+    return _ifc_cache
+
+
+def disable_ifc_cache():
+    """ Schaltet den persistenten IfcIndexCache wieder aus. """
+    global _ifc_cache
+    if _ifc_cache is not None:
+        _ifc_cache.close()
+    _ifc_cache = None
+
+
+_STEP_RECORD = re.compile(r"#(\d+)\s*=\s*([A-Za-z0-9_]+)\s*\((.*)\)\s*;\s*$", re.DOTALL)
+_STEP_SCHEMA = re.compile(r"FILE_SCHEMA\s*\(\s*\(\s*'([^']+)'", re.IGNORECASE)
+_STEP_DELIMITER = re.compile(r"'|/\*|\*/|;")
+_STEP_TOKEN = re.compile(r"\s+|'(?:[^']|'')*'|#\d+|[A-Za-z_][A-Za-z0-9_]*(?=\s*\()|[(),]|[^,()'\s]+")
+
+
+def _iter_step_records(ifc_path):
+    """
+    Liest ein IFC-SPF zeilenweise und liefert jeden vollständigen Datensatz als (id, TYP, Argument-Text).
+    Datensätze werden an ';' ausserhalb von Strings und /* */-Kommentaren getrennt, auch mehrere auf einer
+    Zeile. Es wird immer nur ein Datensatz im Speicher gehalten. FILE_SCHEMA wird als
+    (None, 'FILE_SCHEMA', name) geliefert.
+    """
+    parts = []
+    in_string = in_comment = False
+    with open(ifc_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            # häufigster Fall, exakt: ein Datensatz endet auf dieser Zeile, ohne Kommentar und ohne ';' im String
+            if not (in_string or in_comment) and line.count(';') == 1 and line.rstrip().endswith(';') \
+                    and '/*' not in line and not line.count("'") % 2:
+                parts.append(line)
+                record = _step_record(''.join(parts).strip())
+                parts = []
+                if record:
+                    yield record
+                continue
+            start = 0
+            for match in _STEP_DELIMITER.finditer(line):
+                token = match.group()
+                if in_comment:
+                    if token == '*/':
+                        in_comment = False
+                        start = match.end()
+                elif token == "'":
+                    # '' innerhalb eines Strings schaltet zweimal um und stört nicht
+                    in_string = not in_string
+                elif in_string:
+                    continue
+                elif token == '/*':
+                    parts.append(line[start:match.start()])
+                    in_comment = True
+                elif token == ';':
+                    parts.append(line[start:match.end()])
+                    start = match.end()
+                    record = _step_record(''.join(parts).strip())
+                    parts = []
+                    if record:
+                        yield record
+            if not in_comment:
+                parts.append(line[start:])
+
+
+def _step_record(record):
+    """ Ein Datensatz als (id, TYP, Argument-Text), FILE_SCHEMA als (None, 'FILE_SCHEMA', name), sonst None. """
+    match = _STEP_RECORD.match(record)
+    if match:
+        return int(match.group(1)), match.group(2).upper(), match.group(3)
+    if record.upper().startswith('FILE_SCHEMA'):
+        schema = _STEP_SCHEMA.match(record)
+        if schema:
+            return None, 'FILE_SCHEMA', schema.group(1)
+    return None
+
+
+def _parse_step_args(text):
+    """
+    Zerlegt die Argumentliste eines STEP-Datensatzes. Referenzen werden zu int, Strings zu str,
+    Listen zu list, typisierte Werte wie IFCLABEL('x') zu (TYP, [args]) und $ / * zu None.
+    """
+    stack = [[]]
+    typed = [None]
+    pending_type = None
+    for match in _STEP_TOKEN.finditer(text):
+        token = match.group()
+        if token.isspace() or token == ',':
+            continue
+        if token == '(':
+            stack.append([])
+            typed.append(pending_type)
+            pending_type = None
+        elif token == ')':
+            group = stack.pop()
+            type_name = typed.pop()
+            stack[-1].append((type_name.upper(), group) if type_name else group)
+        elif token[0] == "'":
+            stack[-1].append(_decode_step_string(token[1:-1]))
+        elif token[0] == '#':
+            stack[-1].append(int(token[1:]))
+        elif token in ('$', '*'):
+            stack[-1].append(None)
+        elif token[0].isalpha() or token[0] == '_':
+            pending_type = token
+        else:
+            stack[-1].append(token)
+    return stack[0]
+
+
+def _decode_step_string(value):
+    """ Dekodiert die STEP-Escapes ('' \\ \\S\\ \\X\\ \\X2\\ \\X4\\) eines Strings. """
+    value = value.replace("''", "'")
+    if '\\' not in value:
+        return value
+
+    def wide(match, width):
+        digits = match.group(1)
+        return ''.join(chr(int(digits[i:i + width], 16)) for i in range(0, len(digits), width))
+
+    value = re.sub(r"\\X2\\((?:[0-9A-Fa-f]{4})+)\\X0\\", lambda m: wide(m, 4), value)
+    value = re.sub(r"\\X4\\((?:[0-9A-Fa-f]{8})+)\\X0\\", lambda m: wide(m, 8), value)
+    value = re.sub(r"\\X\\([0-9A-Fa-f]{2})", lambda m: chr(int(m.group(1), 16)), value)
+    value = re.sub(r"\\S\\(.)", lambda m: chr(ord(m.group(1)) + 128), value)
+    return value.replace('\\\\', '\\')
+
+
+def _definition_ids(value):
+    """
+    Gibt RelatingPropertyDefinition als Liste von ids zurück. IFC4 erlaubt neben #1 auch ein
+    IfcPropertySetDefinitionSet, das als (#1,#2) oder IFCPROPERTYSETDEFINITIONSET((#1,#2)) geschrieben wird.
+    """
+    if isinstance(value, tuple):
+        value = value[1]
+    while isinstance(value, list) and len(value) == 1 and isinstance(value[0], list):
+        value = value[0]
+    return value if isinstance(value, list) else [value]
+
+
+def scan_ifc(ifc_path, printout=False):
+    """
+    Baut Typ-Histogramm und Pset/Property-Inventar eines IFC-files, ohne das Modell zu laden.
+
+    Das IFC-SPF wird zweimal zeilenweise gelesen. Im ersten Durchlauf werden die Instanzen gezählt und
+    IfcRelDefinesByProperties, IfcPropertySet und IfcProperty-Namen gesammelt, im zweiten die Typen der
+    referenzierten Objekte und die Namen weiterer Pset-Definitionen (z.B. IfcElementQuantity) nachgeschlagen.
+    Geometrie wird nie geparst, der Speicherbedarf wächst nur mit der Anzahl Property-Datensätze.
+    Die Resultate entsprechen get_element_types, get_psets_for_entity und get_properties_in_pset.
+
+    Parameters:
+    ifc_path (str): Pfad zum IFC-file
+    printout (bool): Debug Informationen ausgeben oder nicht
+
+    Returns:
+    IfcPropertyIndex: Index mit element_counts, psets und pset_properties, aber ohne Property-Werte.
+    """
+    schema = None
+    type_names = {}  # IFCWALL -> IfcWall
+    upper_counts = {}
+    rels = []  # (RelatedObjects, RelatingPropertyDefinitions)
+    pset_records = {}  # id -> (Name, HasProperties)
+    first_psets = {}  # Name -> HasProperties des ersten Psets mit diesem Namen
+    property_names = {}
+
+    type_chains = {}  # IFCWALL -> [IfcWall, IfcBuildingElement, ...]
+
+    def proper_name(upper_name):
+        if upper_name not in type_names:
+            try:
+                type_names[upper_name] = schema.declaration_by_name(upper_name).name()
+            except Exception:
+                type_names[upper_name] = upper_name
+        return type_names[upper_name]
+
+    def type_chain(upper_name):
+        if upper_name not in type_chains:
+            type_chains[upper_name] = _type_chain(schema, proper_name(upper_name))
+        return type_chains[upper_name]
+
+    for entity_id, entity_type, args in _iter_step_records(ifc_path):
+        if entity_id is None:
+            schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(args)
+            continue
+        upper_counts[entity_type] = upper_counts.get(entity_type, 0) + 1
+        if entity_type == 'IFCRELDEFINESBYPROPERTIES':
+            values = _parse_step_args(args)
+            rels.append((values[4], _definition_ids(values[5])))
+        elif entity_type == 'IFCPROPERTYSET':
+            values = _parse_step_args(args)
+            pset_records[entity_id] = (values[2], values[4])
+            first_psets.setdefault(values[2], values[4])
+        elif entity_type.startswith('IFCPROPERTY') or entity_type == 'IFCCOMPLEXPROPERTY':
+            if schema is not None and 'IfcProperty' in type_chain(entity_type):
+                property_names[entity_id] = _parse_step_args(args)[0]
+
+    object_types = {entity_id: None for objects, _ in rels for entity_id in objects}
+    definition_names = {entity_id: None for _, definitions in rels for entity_id in definitions
+                        if entity_id not in pset_records}
+    if object_types or definition_names:
+        for entity_id, entity_type, args in _iter_step_records(ifc_path):
+            if entity_id in object_types:
+                object_types[entity_id] = entity_type
+            if entity_id in definition_names:
+                definition_names[entity_id] = _parse_step_args(args)[2]
+
+    index = IfcPropertyIndex()
+    index.schema = schema.name() if schema is not None else None
+    for upper_name, count in upper_counts.items():
+        index.element_counts[proper_name(upper_name)] = count
+    for pset_name, properties in first_psets.items():
+        index.pset_properties[pset_name] = [property_names.get(prop) for prop in properties]
+    for objects, definitions in rels:
+        names = [pset_records[d][0] if d in pset_records else definition_names.get(d) for d in definitions]
+        for entity_id in objects:
+            upper_name = object_types.get(entity_id)
+            if upper_name is None:
+                continue
+            for type_name in type_chain(upper_name):
+                index.psets.setdefault(type_name, set()).update(names)
+
+    if printout:
+        print(f"Scanned {sum(index.element_counts.values())} entities, "
+              f"{len(index.element_counts)} types, {len(index.pset_properties)} psets in {ifc_path}")
+    return index
+
+
+def get_element_types(ifc_path, printout=False, streaming=False) -> list:
     """
     Listet alle elemelnt typen in IFC auf.
     
     Parameters:
-    ifc_file_path (str): Pfad zum IFC-file
+    ifc_path (str | ifcopenshell.file | IfcPropertyIndex): Pfad zum IFC-file, geladenes Modell oder Index
     printout (bool): Debug Informationen ausgeben oder nicht
+    streaming (bool): Pfade mit scan_ifc() lesen statt das Modell zu laden
     
     Returns:
     list of element types.
     """
     try:
-        ifc_file = ifcopenshell.open(ifc_path)
-        element_types = set()
-        for entity in ifc_file:
-            element_types.add(entity.is_a())
+        element_types = _as_index(ifc_path, streaming).element_types
         if printout:
             print(f"Element types: {element_types}")
         return list(element_types)
@@ -83,26 +729,21 @@ def get_element_types(ifc_path, printout=False) -> list:
         return []
 
 
-def get_psets_for_entity(ifc_path, entity_type, printout=False):
+def get_psets_for_entity(ifc_path, entity_type, printout=False, streaming=False):
     """
     Listet alle Psets für einen entity-typen in IFC auf.
     
     Parameters:
-    ifc_file_path (str): Pfad zum IFC-file
+    ifc_path (str | ifcopenshell.file | IfcPropertyIndex): Pfad zum IFC-file, geladenes Modell oder Index
     entity_type (str): IFC entity typ, (z.B. IfcSlab, IfcWall)
     printout (bool): Debug Informationen ausgeben oder nicht
+    streaming (bool): Pfade mit scan_ifc() lesen statt das Modell zu laden
     
     Returns:
     list of element types.
     """
     try:
-        ifc_file = ifcopenshell.open(ifc_path)
-        psets = set()
-        for entity in ifc_file.by_type(entity_type):
-            if hasattr(entity, 'IsDefinedBy'):
-                for definition in entity.IsDefinedBy:
-                    if definition.is_a('IfcRelDefinesByProperties'):
-                        psets.add(definition.RelatingPropertyDefinition.Name)
+        psets = _as_index(ifc_path, streaming).psets.get(entity_type, set())
         if printout:
             print(f"Psets for {entity_type}: {psets}")
         return list(psets)
@@ -114,26 +755,25 @@ def get_psets_for_entity(ifc_path, entity_type, printout=False):
         return []
 
 
-def get_properties_in_pset(ifc_path, pset_name, printout=False):
+def get_properties_in_pset(ifc_path, pset_name, printout=False, streaming=False):
     """
     Liste von Attributen in einem PSET.
     Parameters:
-    ifc_file_path (str): Pfad zum IFC-file
+    ifc_path (str | ifcopenshell.file | IfcPropertyIndex): Pfad zum IFC-file, geladenes Modell oder Index
     pset_name (str): PSET
     printout (bool): Debug Informationen ausgeben oder nicht
+    streaming (bool): Pfade mit scan_ifc() lesen statt das Modell zu laden
 
     Returns:
     list der properties des PSETS
     """
     try:
-        ifc_file = ifcopenshell.open(ifc_path)
-        for entity in ifc_file.by_type('IfcPropertySet'):
-            if entity.Name == pset_name:
-                properties = [prop.Name for prop in entity.HasProperties]
-                if printout:
-                    print(f"Properties in {pset_name}: {properties}")
-                return properties
-        return []
+        properties = _as_index(ifc_path, streaming).pset_properties.get(pset_name)
+        if properties is None:
+            return []
+        if printout:
+            print(f"Properties in {pset_name}: {properties}")
+        return list(properties)
     except FileNotFoundError:
         print(f"File not found: {ifc_path}")
         return []
@@ -147,7 +787,7 @@ def get_property_value(ifc_path, entity_type, pset_name, property_name, printout
     Eigenschaft abrufen.
     
      Parameters:
-    ifc_file_path (str): Pfad zum IFC-file
+    ifc_path (str | ifcopenshell.file | IfcPropertyIndex): Pfad zum IFC-file, geladenes Modell oder Index
     entity_type (str): IFC entity typ, (z.B. IfcSlab, IfcWall)
     pset_name (str): PSET
     property_name (str): Name des Property.
@@ -157,19 +797,13 @@ def get_property_value(ifc_path, entity_type, pset_name, property_name, printout
     Any: den Wert der Property.
     """
     try:
-        ifc_file = ifcopenshell.open(ifc_path)
-        for entity in ifc_file.by_type(entity_type):
-            if hasattr(entity, 'IsDefinedBy'):
-                for definition in entity.IsDefinedBy:
-                    if definition.is_a('IfcRelDefinesByProperties'):
-                        pset = definition.RelatingPropertyDefinition
-                        if pset.Name == pset_name:
-                            for prop in pset.HasProperties:
-                                if prop.Name == property_name:
-                                    if printout:
-                                        print(f"Value of {property_name} in {pset_name} "
-                                              f"for {entity_type}: {prop.NominalValue}")
-                                    return prop.NominalValue
+        values = _as_index(ifc_path).values
+        key = (entity_type, pset_name, property_name)
+        if key in values:
+            if printout:
+                print(f"Value of {property_name} in {pset_name} "
+                      f"for {entity_type}: {values[key]}")
+            return values[key]
         raise ValueError(f"Property '{property_name}' not found in pset '{pset_name}' "
                          f"for entity type '{entity_type}'")
     except FileNotFoundError:
@@ -183,45 +817,39 @@ def get_property_value(ifc_path, entity_type, pset_name, property_name, printout
 def compare_ifcs(ifc_path1, ifc_path2, printout=False):
     """
     Zwei IFC's vergleichen und einen similiarity-score in Prozent berechnen.
+    Jedes IFC wird dabei genau einmal geöffnet und in einen IfcPropertyIndex übersetzt.
     
     Parameters:
-    ifc_path1 (str): Pfad zum ersten IFC-file.
-    ifc_path2 (str): Pfad zum zweiten IFC-file
+    ifc_path1 (str | ifcopenshell.file | IfcPropertyIndex): erstes IFC (Pfad, Modell oder Index).
+    ifc_path2 (str | ifcopenshell.file | IfcPropertyIndex): zweites IFC (Pfad, Modell oder Index).
     printout (bool): Debug Informationen ausgeben oder nicht
 
     Returns:
     dict: Anzahl Abfragen (int), Anzahl Matches(int), similarity score in %.
     """
-    element_types = get_element_types(ifc_path1, printout)
+    index1 = _load_index(ifc_path1)
+    index2 = _load_index(ifc_path2)
+
+    element_types = get_element_types(index1, printout)
     
     all_psets = {}
     for entity_type in element_types:
-        psets = get_psets_for_entity(ifc_path1, entity_type, printout)
+        psets = get_psets_for_entity(index1, entity_type, printout)
         all_psets[entity_type] = psets
 
     all_properties = {}
     for entity_type, psets in all_psets.items():
         for pset in psets:
-            properties = get_properties_in_pset(ifc_path1, pset, printout)
+            properties = get_properties_in_pset(index1, pset, printout)
             all_properties[(entity_type, pset)] = properties
 
-    all_values_ifc1 = []
-    for (entity_type, pset), properties in all_properties.items():
-        for prop in properties:
-            try:
-                value = get_property_value(ifc_path1, entity_type, pset, prop, printout)
-                all_values_ifc1.append(value)
-            except ValueError as e:
-                if printout:
-                    print(e)
-    
     request_count = 0
     matched_count = 0
     for (entity_type, pset), properties in all_properties.items():
         for prop in properties:
             try:
-                value_ifc1 = get_property_value(ifc_path1, entity_type, pset, prop, printout)
-                value_ifc2 = get_property_value(ifc_path2, entity_type, pset, prop, printout)
+                value_ifc1 = get_property_value(index1, entity_type, pset, prop, printout)
+                value_ifc2 = get_property_value(index2, entity_type, pset, prop, printout)
                 request_count += 1
                 if isinstance(value_ifc2, type(value_ifc1)):
                     matched_count += 1
@@ -241,6 +869,17 @@ def compare_ifcs(ifc_path1, ifc_path2, printout=False):
     }
 
 
+def _load_index(ifc_source):
+    """ Wie _as_index, gibt bei Fehlern aber einen leeren Index zurück (wie die Abfragefunktionen). """
+    try:
+        return _as_index(ifc_source)
+    except FileNotFoundError:
+        print(f"File not found: {ifc_source}")
+    except Exception as e:
+        print(f"Error parsing IFC file: {e}")
+    return IfcPropertyIndex()
+
+
 def load_ifc(file_path):
     """ Lädt eine IFC-Datei und gibt das Modell zurück. """
     return ifcopenshell.open(file_path)
@@ -257,23 +896,193 @@ def extract_structure(ifc_model):
     return elements
 
 
+def count_structure(ifc_model):
+    """ Wie extract_structure, zählt aber nur die Instanzen pro Typ statt sie zu behalten. """
+    counts = {}
+    for element in ifc_model.by_type('IfcProduct'):
+        element_type = element.is_a()
+        counts[element_type] = counts.get(element_type, 0) + 1
+    return counts
+
+
 def compare_ifc_models(model1, model2):
     """ Vergleicht zwei IFC-Modelle auf ihre Ähnlichkeit basierend auf ihrer Struktur. """
-    structure1 = extract_structure(model1)
-    structure2 = extract_structure(model2)
-    
-    # Ähnlichkeit basierend auf der Anzahl der gleichen Typen
-    score = 0
-    total_types = set(structure1.keys()).union(set(structure2.keys()))
-    for type_name in total_types:
-        if type_name in structure1 and type_name in structure2:
-            score += min(len(structure1[type_name]), len(structure2[type_name]))
-        elif type_name in structure1 or type_name in structure2:
-            score -= 1
-    
-    max_score = sum(max(len(structure1.get(t, [])), len(structure2.get(t, []))) for t in total_types)
-    similarity = score / max_score if max_score > 0 else 0
-    return similarity
+    return _structure_similarity(count_structure(model1), count_structure(model2))
+
+
+def _structure_similarity(counts1, counts2):
+    """ Ähnlichkeit zweier Typ-Zählungen (count_structure), Kern von compare_ifc_models. """
+    vectors, _ = structure_vectors([counts1, counts2])
+    return float(similarity_matrix(vectors[:1], vectors[1:])[0, 0])
+
+
+def structure_vectors(structures, vocabulary=None):
+    """
+    Übersetzt Typ-Zählungen in eine Matrix über ein gemeinsames Vokabular.
+
+    Parameters:
+    structures (list of dict): Typ-Zählungen, z.B. von count_structure() oder IfcPropertyIndex.element_counts
+    vocabulary (list): Typnamen in Spaltenreihenfolge, None für die Vereinigung aller Typen
+
+    Returns:
+    tuple: (np.ndarray N x V mit den Anzahlen, Vokabular als Liste).
+    """
+    if vocabulary is None:
+        vocabulary = list(dict.fromkeys(type_name for counts in structures for type_name in counts))
+    columns = {type_name: i for i, type_name in enumerate(vocabulary)}
+    vectors = np.zeros((len(structures), len(vocabulary)), dtype=np.float64)
+    for row, counts in enumerate(structures):
+        for type_name, count in counts.items():
+            if type_name in columns:
+                vectors[row, columns[type_name]] = count
+    return vectors, vocabulary
+
+
+def property_vectors(indexes, vocabulary=None):
+    """
+    Übersetzt IfcPropertyIndex-Objekte in Vorhandensein-Vektoren über (entity_type, pset, property).
+
+    Parameters:
+    indexes (list of IfcPropertyIndex): Indizes der Modelle
+    vocabulary (list): Schlüssel in Spaltenreihenfolge, None für die Vereinigung aller Schlüssel
+
+    Returns:
+    tuple: (np.ndarray N x V mit 1.0 wo die Property einen Wert hat, Vokabular als Liste).
+    """
+    return structure_vectors([dict.fromkeys(index.values, 1) for index in indexes], vocabulary)
+
+
+def similarity_matrix(vectors1, vectors2=None, metric='score', chunk_size=256):
+    """
+    Berechnet alle paarweisen Ähnlichkeiten zwischen den Zeilen zweier Matrizen.
+
+    'score' entspricht compare_ifc_models: Summe der Minima gemeinsamer Typen, minus 1 pro Typ der nur in
+    einem Modell vorkommt, geteilt durch die Summe der Maxima. Dafür wird min/max über
+    min = (|a| + |b| - |a - b|) / 2 und max = (|a| + |b| + |a - b|) / 2 aus der L1-Distanz gewonnen.
+    'cosine' vergleicht die Anzahlen, 'jaccard' nur das Vorhandensein (> 0).
+
+    Parameters:
+    vectors1 (np.ndarray): N x V, z.B. von structure_vectors()
+    vectors2 (np.ndarray): M x V, None für vectors1 (N x N über ein Korpus)
+    metric (str): 'score', 'cosine' oder 'jaccard'
+    chunk_size (int): Zeilen von vectors1 pro Block bei 'score', begrenzt den Speicher auf chunk_size x M x V
+
+    Returns:
+    np.ndarray: N x M Ähnlichkeiten.
+    """
+    a = np.asarray(vectors1, dtype=np.float64)
+    b = a if vectors2 is None else np.asarray(vectors2, dtype=np.float64)
+    present_a = (a > 0).astype(np.float64)
+    present_b = (b > 0).astype(np.float64)
+
+    if metric == 'cosine':
+        norms = np.linalg.norm(a, axis=1)[:, None] * np.linalg.norm(b, axis=1)[None, :]
+        return np.divide(a @ b.T, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    types_a = present_a.sum(axis=1)[:, None]
+    types_b = present_b.sum(axis=1)[None, :]
+    shared = present_a @ present_b.T
+    if metric == 'jaccard':
+        union = types_a + types_b - shared
+        return np.divide(shared, union, out=np.zeros_like(union), where=union > 0)
+    if metric != 'score':
+        raise ValueError(f"Unknown metric: {metric}")
+
+    l1 = np.empty((a.shape[0], b.shape[0]), dtype=np.float64)
+    for start in range(0, a.shape[0], chunk_size):
+        block = a[start:start + chunk_size]
+        l1[start:start + chunk_size] = np.abs(block[:, None, :] - b[None, :, :]).sum(axis=2)
+    total = a.sum(axis=1)[:, None] + b.sum(axis=1)[None, :]
+    score = (total - l1) / 2 - (types_a + types_b - 2 * shared)
+    max_score = (total + l1) / 2
+    return np.divide(score, max_score, out=np.zeros_like(max_score), where=max_score > 0)
+
+
+_batch_reference = None
+
+
+def _init_batch_worker(reference):
+    """ Initializer der Worker-Prozesse: die Referenz wird pro Prozess nur einmal übertragen. """
+    global _batch_reference
+    _batch_reference = reference
+
+
+def _compare_with_reference(ifc_path):
+    """ Vergleicht ein Modell mit der Referenz des Worker-Prozesses (läuft im Worker). """
+    start = time.perf_counter()
+    reference_index, reference_counts = _batch_reference
+    # die Getter melden fehlende Properties auf stdout, das gehört nicht in den JSON-lines-Strom
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            ifc_model = ifcopenshell.open(ifc_path)
+            result = compare_ifcs(reference_index, IfcPropertyIndex(ifc_model))
+            result["structure_similarity"] = _structure_similarity(reference_counts, count_structure(ifc_model))
+        except Exception as e:
+            result = {"error": str(e)}
+    return {"path": ifc_path, **result, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def _collect_ifc_paths(models):
+    """ Verzeichnis (alle *.ifc darin), Glob-Muster oder Liste von Pfaden zu einer sortierten Pfadliste. """
+    if isinstance(models, (list, tuple)):
+        return list(models)
+    if os.path.isdir(models):
+        return sorted(path for path in glob.glob(os.path.join(models, '*'))
+                      if path.lower().endswith('.ifc'))
+    return sorted(glob.glob(models, recursive=True))
+
+
+def compare_ifc_batch(reference_path, models, max_workers=None, printout=False):
+    """
+    Vergleicht viele IFC-Modelle parallel mit einem Referenzmodell.
+
+    Die Referenz wird einmal im aufrufenden Prozess geparst und als IfcPropertyIndex und Typ-Zählung
+    an jeden Worker übergeben. Jedes Modell wird in einem Worker genau einmal geöffnet. Die Resultate
+    werden geliefert, sobald ein Modell fertig ist, also nicht in der Reihenfolge der Eingabe.
+
+    Parameters:
+    reference_path (str): Pfad zum Referenz-IFC
+    models (str | list): Verzeichnis, Glob-Muster (z.B. 'modelle/**/*.ifc') oder Liste von Pfaden
+    max_workers (int): Anzahl Prozesse, None für die Anzahl CPUs
+    printout (bool): Debug Informationen ausgeben oder nicht
+
+    Returns:
+    generator of dict: pro Modell path, requests_made, requests_matched, similarity_score,
+    structure_similarity und seconds, oder error.
+    """
+    ifc_paths = _collect_ifc_paths(models)
+    reference_model = ifcopenshell.open(reference_path)
+    reference = (IfcPropertyIndex(reference_model), count_structure(reference_model))
+    del reference_model
+    if printout:
+        print(f"Comparing {len(ifc_paths)} models against {reference_path}")
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_batch_worker,
+                             initargs=(reference,)) as executor:
+        futures = [executor.submit(_compare_with_reference, ifc_path) for ifc_path in ifc_paths]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def batch_main(argv=None):
+    """ CLI: python IFC-checker.py batch referenz.ifc "modelle/*.ifc" [--workers N] [--output out.jsonl] """
+    parser = argparse.ArgumentParser(prog='IFC-checker.py batch',
+                                     description='Vergleicht viele IFC-Modelle parallel mit einer Referenz '
+                                                 'und schreibt die Resultate als JSON lines.')
+    parser.add_argument('reference', help='Pfad zum Referenz-IFC')
+    parser.add_argument('models', help='Verzeichnis oder Glob-Muster der zu prüfenden IFCs')
+    parser.add_argument('--workers', type=int, default=None, help='Anzahl Prozesse (Standard: Anzahl CPUs)')
+    parser.add_argument('--output', default='-', help='Ausgabedatei, - für stdout')
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        for result in compare_ifc_batch(args.reference, args.models, args.workers):
+            out.write(json.dumps(result, ensure_ascii=False) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
 
 
 def main():
@@ -286,9 +1095,16 @@ def main():
     similarity_score = compare_ifc_models(model1, model2)
     print(f"Ähnlichkeit: {similarity_score:.2f}")
 
-    result = compare_ifcs(ifc_file1, ifc_file2, printout=True)
+    result = compare_ifcs(model1, model2, printout=True)
     print(result)
 
 
+if os.environ.get('IFC_CACHE_PATH'):
+    enable_ifc_cache(os.environ['IFC_CACHE_PATH'])
+
+
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        batch_main(sys.argv[2:])
+    else:
+        main()
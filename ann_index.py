@@ -0,0 +1,223 @@
+import json
+import time
+
+import numpy as np
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _nearest(data: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    # nearest centroid by squared L2; |x|^2 is the same for every centroid and can be dropped
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assign = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        distances = centroid_norms[None, :] - 2 * data[start:start + chunk_size] @ centroids.T
+        assign[start:start + chunk_size] = distances.argmin(axis=1)
+    return assign
+
+
+def kmeans(data, k: int, iterations: int = 20, sample_size: int = 100_000, seed: int = 0) -> np.ndarray:
+    # plain Lloyd k-means on a random sample; empty clusters are re-seeded with random points
+    data = np.asarray(data, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    if len(data) > sample_size:
+        data = data[rng.choice(len(data), sample_size, replace=False)]
+    if len(data) < k:
+        raise ValueError(f"need at least {k} training vectors, got {len(data)}")
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _nearest(data, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        if not filled.all():
+            centroids[~filled] = data[rng.choice(len(data), int((~filled).sum()), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """
+    Approximate cosine nearest-neighbour index: an inverted file (IVF) over k-means cells, optionally with
+    product quantization (PQ) of the residuals.
+
+    Vectors are normalized, assigned to the nearest of nlist centroids and stored in that cell's list. A query
+    only scans the nprobe cells whose centroids score highest. With pq_m > 0 each residual (vector - centroid)
+    is split into pq_m sub-vectors and stored as one byte per sub-vector; scores are then
+    q . centroid + sum of per-subspace lookup tables, so the raw vectors do not have to be kept in memory.
+    """
+
+    def __init__(self, dim: int, nlist: int = 256, pq_m: int = 0, pq_bits: int = 8):
+        if pq_m and dim % pq_m:
+            raise ValueError(f"dim {dim} is not divisible by pq_m {pq_m}")
+        if not 1 <= pq_bits <= 8:
+            raise ValueError("pq_bits must be between 1 and 8")
+        self.dim = dim
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.pq_bits = pq_bits
+        self.centroids = None
+        self.codebooks = None  # (pq_m, 2 ** pq_bits, dim // pq_m)
+        self._ids = [np.zeros(0, dtype=np.int64) for _ in range(nlist)]
+        self._codes = [self._empty_codes() for _ in range(nlist)]
+        self._next_id = 0
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._ids)
+
+    def _empty_codes(self):
+        if self.pq_m:
+            return np.zeros((0, self.pq_m), dtype=np.uint8)
+        return np.zeros((0, self.dim), dtype=np.float32)
+
+    def train(self, vectors, iterations: int = 20, sample_size: int = 100_000):
+        vectors = _normalize(vectors)
+        self.centroids = kmeans(vectors, self.nlist, iterations, sample_size)
+        if self.pq_m:
+            residuals = vectors - self.centroids[_nearest(vectors, self.centroids)]
+            sub_dim = self.dim // self.pq_m
+            self.codebooks = np.stack([
+                kmeans(residuals[:, j * sub_dim:(j + 1) * sub_dim], 2 ** self.pq_bits, iterations, sample_size)
+                for j in range(self.pq_m)])
+        return self
+
+    def build(self, vectors, ids=None, iterations: int = 20, sample_size: int = 100_000):
+        return self.train(vectors, iterations, sample_size).add(vectors, ids)
+
+    def _encode(self, vectors, cells):
+        if not self.pq_m:
+            return vectors
+        residuals = vectors - self.centroids[cells]
+        sub_dim = self.dim // self.pq_m
+        codes = np.empty((len(vectors), self.pq_m), dtype=np.uint8)
+        for j in range(self.pq_m):
+            codes[:, j] = _nearest(residuals[:, j * sub_dim:(j + 1) * sub_dim], self.codebooks[j])
+        return codes
+
+    def add(self, vectors, ids=None):
+        if self.centroids is None:
+            raise ValueError("index is not trained, call train() or build() first")
+        vectors = _normalize(vectors)
+        if ids is None:
+            ids = np.arange(self._next_id, self._next_id + len(vectors), dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64)
+        self._next_id = max(self._next_id, int(ids.max()) + 1) if len(ids) else self._next_id
+
+        cells = _nearest(vectors, self.centroids)
+        codes = self._encode(vectors, cells)
+        order = np.argsort(cells, kind="stable")
+        bounds = np.searchsorted(cells[order], np.arange(self.nlist + 1))
+        for cell in np.flatnonzero(np.diff(bounds)):
+            rows = order[bounds[cell]:bounds[cell + 1]]
+            self._ids[cell] = np.concatenate([self._ids[cell], ids[rows]])
+            self._codes[cell] = np.concatenate([self._codes[cell], codes[rows]])
+        return self
+
+    def query(self, queries, k: int = 10, nprobe: int = 8) -> tuple[np.ndarray, np.ndarray]:
+        # returns (ids, scores), each (n_queries, k); missing results are padded with -1 / -inf
+        queries = _normalize(queries)
+        nprobe = min(nprobe, self.nlist)
+        result_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        result_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        coarse = queries @ self.centroids.T
+        sub_dim = self.dim // self.pq_m if self.pq_m else 0
+
+        for i, q in enumerate(queries):
+            probe = np.argpartition(-coarse[i], nprobe - 1)[:nprobe]
+            if self.pq_m:
+                tables = np.einsum("jcd,jd->jc", self.codebooks, q.reshape(self.pq_m, sub_dim))
+            candidate_ids, candidate_scores = [], []
+            for cell in probe:
+                if not len(self._ids[cell]):
+                    continue
+                if self.pq_m:
+                    scores = coarse[i, cell] + tables[np.arange(self.pq_m), self._codes[cell]].sum(axis=1)
+                else:
+                    scores = self._codes[cell] @ q
+                candidate_ids.append(self._ids[cell])
+                candidate_scores.append(scores)
+            if not candidate_ids:
+                continue
+            candidate_ids = np.concatenate(candidate_ids)
+            candidate_scores = np.concatenate(candidate_scores)
+            if len(candidate_scores) > k:
+                top = np.argpartition(-candidate_scores, k)[:k]
+            else:
+                top = np.arange(len(candidate_scores))
+            top = top[np.argsort(-candidate_scores[top])]
+            result_ids[i, :len(top)] = candidate_ids[top]
+            result_scores[i, :len(top)] = candidate_scores[top]
+        return result_ids, result_scores
+
+    def save(self, path):
+        # single .npz: cell lists are concatenated, offsets mark where each cell starts
+        offsets = np.cumsum([0] + [len(ids) for ids in self._ids])
+        meta = {"dim": self.dim, "nlist": self.nlist, "pq_m": self.pq_m, "pq_bits": self.pq_bits,
+                "next_id": self._next_id}
+        arrays = {"meta": np.array(json.dumps(meta)), "centroids": self.centroids, "offsets": offsets,
+                  "ids": np.concatenate(self._ids), "codes": np.concatenate(self._codes)}
+        if self.codebooks is not None:
+            arrays["codebooks"] = self.codebooks
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path) -> "IVFIndex":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            index = cls(meta["dim"], meta["nlist"], meta["pq_m"], meta["pq_bits"])
+            index.centroids = data["centroids"]
+            index.codebooks = data["codebooks"] if "codebooks" in data else None
+            offsets, ids, codes = data["offsets"], data["ids"], data["codes"]
+        index._ids = [ids[offsets[c]:offsets[c + 1]] for c in range(index.nlist)]
+        index._codes = [codes[offsets[c]:offsets[c + 1]] for c in range(index.nlist)]
+        index._next_id = meta["next_id"]
+        return index
+
+
+def exact_search(vectors, queries, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+    # brute-force cosine top-k, the ground truth for benchmark()
+    vectors = _normalize(vectors)
+    scores = _normalize(queries) @ vectors.T
+    k = min(k, vectors.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def benchmark(index: IVFIndex, vectors, queries, k: int = 10, nprobes=(1, 2, 4, 8, 16, 32)) -> list[dict]:
+    # recall@k and queries per second of the index against exact search;
+    # assumes the index was built from vectors with the default ids (row numbers)
+    queries = np.asarray(queries, dtype=np.float32)
+    start = time.perf_counter()
+    truth, _ = exact_search(vectors, queries, k)
+    results = [{"method": "exact", "nprobe": None, "recall": 1.0,
+                "qps": len(queries) / (time.perf_counter() - start)}]
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        ids, _ = index.query(queries, k, nprobe)
+        seconds = time.perf_counter() - start
+        hits = sum(len(np.intersect1d(found, expected)) for found, expected in zip(ids, truth))
+        results.append({"method": "ivf-pq" if index.pq_m else "ivf", "nprobe": nprobe,
+                        "recall": hits / truth.size, "qps": len(queries) / seconds})
+    return results
+
+
+if __name__ == '__main__':
+    # synthetic clustered data in the shape of all-MiniLM-L6-v2 embeddings
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(200, 384)).astype(np.float32)
+    data = centers[rng.integers(0, 200, 50_000)] + 0.5 * rng.normal(size=(50_000, 384)).astype(np.float32)
+    test_queries = data[rng.choice(len(data), 500, replace=False)] + 0.1 * rng.normal(size=(500, 384))
+
+    for pq in (0, 48):
+        ivf = IVFIndex(384, nlist=256, pq_m=pq).build(data, iterations=10)
+        for row in benchmark(ivf, data, test_queries, k=10):
+            print(f"{row['method']:>6} nprobe={str(row['nprobe']):>4} "
+                  f"recall@10={row['recall']:.3f} qps={row['qps']:.0f}")
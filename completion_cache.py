@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class CompletionCache:
+    """
+    Cache for chat completions keyed by SHA-256 of (model, messages, sampling params).
+
+    Responses are kept in an in-memory LRU of max_entries; with a path they are also written to a SQLite file
+    and survive restarts. Identical requests that arrive while the first one is still running wait for its
+    result instead of calling the model again (single-flight), from threads and coroutines alike.
+    hits, misses and coalesced count lookups since the cache was created.
+    """
+
+    def __init__(self, max_entries=1024, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._memory = OrderedDict()
+        self._inflight = {}  # key -> concurrent.futures.Future of the running request
+        self._lock = threading.Lock()
+        self._conn = None
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, model TEXT NOT NULL, "
+                               "response TEXT NOT NULL, created REAL NOT NULL) WITHOUT ROWID")
+
+    @staticmethod
+    def key(model: str, messages, params=None) -> str:
+        payload = json.dumps({"model": model, "messages": messages, "params": params or {}},
+                             sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key):
+        # caller holds the lock; a SQLite hit is promoted into memory
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        if self._conn is not None:
+            row = self._conn.execute("SELECT response FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._remember(key, json.loads(row[0]))
+                return self._memory[key]
+        return None
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._lookup(key)
+
+    def put(self, key, value, model=""):
+        with self._lock:
+            self._remember(key, value)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)",
+                                       (key, model, json.dumps(value, ensure_ascii=False), time.time()))
+
+    def _claim(self, key):
+        # returns (cached value, None, False), (None, running future, False) or (None, new future, True)
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+                return value, None, False
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return None, future, False
+            self.misses += 1
+            future = self._inflight[key] = Future()
+            return None, future, True
+
+    def _finish(self, key, future, value=None, error=None, model=""):
+        # store before the in-flight entry goes away, so later callers find the value in the cache
+        if error is None:
+            self.put(key, value, model)
+        with self._lock:
+            self._inflight.pop(key, None)
+        if future.done():
+            return
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def get_or_compute(self, key, compute, model=""):
+        """Returns the cached response or calls compute() once, shared by all concurrent callers of key."""
+        value, future, owner = self._claim(key)
+        if future is None:
+            return value
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value, model=model)
+        return value
+
+    async def get_or_compute_async(self, key, compute, model=""):
+        """Like get_or_compute, with compute() returning an awaitable; coalesces with threaded callers too."""
+        value, future, owner = self._claim(key)
+        if future is None:
+            return value
+        if not owner:
+            # shielded, so a waiter that is cancelled (e.g. by wait_for) does not cancel the shared future
+            return await asyncio.shield(asyncio.wrap_future(future))
+        # compute() runs in its own task, so cancelling the owner does not fail the call for coalesced waiters
+        task = asyncio.ensure_future(compute())
+        task.add_done_callback(lambda done: self._finish_task(key, future, done, model))
+        return await asyncio.shield(task)
+
+    def _finish_task(self, key, future, task, model):
+        if task.cancelled():
+            self._finish(key, future, error=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self._finish(key, future, error=task.exception())
+        else:
+            self._finish(key, future, task.result(), model=model)
+
+    def stats(self) -> dict:
+        # hit_ratio counts coalesced requests as hits, they did not call the model either
+        lookups = self.hits + self.misses + self.coalesced
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                "entries": len(self._memory)}
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM completions")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    # shared per process and in memory only; MYUTILS_COMPLETION_CACHE adds a SQLite file, "off" disables it
+    global _default_cache
+    path = os.environ.get("MYUTILS_COMPLETION_CACHE")
+    if path == "off":
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = CompletionCache(path=path)
+    return _default_cache
+
+
+def cached_completion(model: str, messages, compute, params=None, use_cache=True, cache=None):
+    """
+    Returns compute() for this request, through the cache unless use_cache is False or caching is off.
+    params are the sampling parameters (temperature, max_tokens, ...) that are part of the key.
+    """
+    if cache is None and use_cache:
+        cache = get_default_cache()
+    if not use_cache or cache is None:
+        return compute()
+    return cache.get_or_compute(cache.key(model, messages, params), compute, model)
+
+
+async def cached_completion_async(model: str, messages, compute, params=None, use_cache=True, cache=None):
+    # async counterpart of cached_completion, compute() returns an awaitable
+    if cache is None and use_cache:
+        cache = get_default_cache()
+    if not use_cache or cache is None:
+        return await compute()
+    return await cache.get_or_compute_async(cache.key(model, messages, params), compute, model)
@@ -1,33 +1,182 @@
+import math
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Replace '<YOUR_CLIENT_ID>' and '<YOUR_CLIENT_SECRET>' with your actual credentials
+# Replace CLIENT_ID and set SIEMENS_API_KEY with your actual credentials
 CLIENT_ID = 'Siemens.Advanta'
-CLIENT_SECRET = os.environ["SIEMENS_API_KEY"]
-
-# Define the URL and the payload
-url = 'https://siemens-bt-015.eu.auth0.com/oauth/token'
-payload = {
-    "client_id": CLIENT_ID,
-    "client_secret": CLIENT_SECRET,
-    "cient_name": "si_ch_be_3010_bern_inselspital_bb12_test",
-    "audience": "https://horizon.siemens.com",
-    "grant_type": "client_credentials"
-}
-
-# Set header for the request
-headers = {
-    'Content-Type': 'application/json'
-}
-
-# Send the POST request
-response = requests.post(url, json=payload, headers=headers)
-
-# Check if the request was successful
-if response.status_code == 200:
-    print("Token received successfully")
-    print(response.json())  # This will print the token and other returned info
-else:
-    print(f"Failed to retrieve token. Status code: {response.status_code}")
-    print(response.text)  # This will print error message if any
+CLIENT_NAME = "si_ch_be_3010_bern_inselspital_bb12_test"
+
+TOKEN_URL = 'https://siemens-bt-015.eu.auth0.com/oauth/token'
+AUDIENCE = "https://horizon.siemens.com"
+
+
+class HorizonClient:
+    """
+    Client for the Horizon API with a cached OAuth token and a pooled keep-alive session.
+
+    The access token from the auth0 client-credentials flow is reused until refresh_margin seconds before
+    expires_in; a background timer renews it then, so requests normally never wait for the token endpoint.
+    All requests share one requests.Session, whose connection pool holds up to pool_size connections.
+    """
+
+    def __init__(self, client_id, client_secret, client_name=CLIENT_NAME, base_url=AUDIENCE, token_url=TOKEN_URL,
+                 audience=AUDIENCE, refresh_margin=60, pool_size=16, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.token_url = token_url
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+        self._payload = {
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "client_name": client_name,
+            "audience": audience,
+            "grant_type": "client_credentials"
+        }
+        self.session = requests.Session()
+        # only idempotent methods (urllib3's default list) are retried, a retried POST could write twice
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size,
+                              max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504)))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.token_requests = 0
+        self._token = None
+        self._refresh_at = 0.0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self.session.close()
+
+    def token(self, force=False):
+        # cached access token, fetched when missing, due or forced (e.g. after a 401)
+        with self._lock:
+            if force or self._token is None or time.monotonic() >= self._refresh_at:
+                self._refresh()
+            return self._token
+
+    def _refresh(self):
+        # caller holds the lock
+        response = self.session.post(self.token_url, json=self._payload, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        self.token_requests += 1
+        self._token = data["access_token"]
+        expires_in = float(data.get("expires_in", 3600))
+        # short-lived tokens are renewed at half their lifetime instead of never being outside the margin
+        delay = max(expires_in - self.refresh_margin, expires_in / 2)
+        self._refresh_at = time.monotonic() + delay
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            with self._lock:
+                self._refresh()
+        except requests.RequestException as e:
+            # the next request refreshes in the foreground
+            print(f"Background token refresh failed: {e}")
+
+    def request(self, method, path, **kwargs):
+        url = path if path.startswith("http") else f"{self.base_url}/{path.lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(2):
+            headers = {**kwargs.pop("headers", {}), "Authorization": f"Bearer {self.token(force=attempt > 0)}"}
+            response = self.session.request(method, url, headers=headers, **kwargs)
+            kwargs["headers"] = headers
+            if response.status_code != 401:
+                break
+        response.raise_for_status()
+        return response
+
+    def get(self, path, params=None):
+        return self.request("GET", path, params=params).json()
+
+    def get_all(self, path, params=None, page_size=100, max_workers=8, page_param="page", size_param="pageSize"):
+        """
+        Fetches all pages of a paginated resource, with up to max_workers pages in flight.
+
+        Pages are numbered from 1. If the first page reports a total (totalPages, or the item count as total /
+        totalCount, also under meta / pagination), the remaining pages are fetched concurrently at once;
+        otherwise in rounds of max_workers pages until a page comes back short.
+
+        Returns:
+        list: the items of all pages in page order.
+        """
+        params = dict(params or {})
+
+        def fetch(page):
+            return _page_items(self.get(path, {**params, page_param: page, size_param: page_size}))
+
+        first = self.get(path, {**params, page_param: 1, size_param: page_size})
+        items = _page_items(first)
+        total_pages = _total_pages(first, page_size)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            if total_pages is not None:
+                for page_items in executor.map(fetch, range(2, total_pages + 1)):
+                    items.extend(page_items)
+                return items
+            page, last = 2, items
+            while len(last) >= page_size:
+                for last in executor.map(fetch, range(page, page + max_workers)):
+                    items.extend(last)
+                    if len(last) < page_size:
+                        break
+                page += max_workers
+        return items
+
+
+def _page_items(body):
+    # the list of records in a page body: the body itself or its data / items / results / value list
+    if isinstance(body, list):
+        return body
+    for key in ("data", "items", "results", "value"):
+        if isinstance(body.get(key), list):
+            return body[key]
+    return []
+
+
+def _total_pages(body, page_size):
+    if not isinstance(body, dict):
+        return None
+    for container in (body, body.get("meta"), body.get("pagination"), body.get("page")):
+        if not isinstance(container, dict):
+            continue
+        for key in ("totalPages", "total_pages"):
+            if isinstance(container.get(key), int):
+                return container[key]
+        # not "count", many APIs use it for the number of items on the current page
+        for key in ("total", "totalCount", "total_count"):
+            if isinstance(container.get(key), int):
+                return math.ceil(container[key] / page_size)
+    return None
+
+
+if __name__ == '__main__':
+    horizon = HorizonClient(CLIENT_ID, os.environ["SIEMENS_API_KEY"])
+    try:
+        horizon.token()
+        print("Token received successfully")
+    except requests.HTTPError as e:
+        print(f"Failed to retrieve token. Status code: {e.response.status_code}")
+        print(e.response.text)  # This will print error message if any
+    finally:
+        horizon.close()
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# vectors are stored as raw float32 blobs and exchanged as float32 matrices; numpy is imported inside the
+# functions, so importing this module stays cheap for local_embeddings
+
+# a hit only rewrites last_used if it is older than this, LRU order does not need to be exact to the second
+TOUCH_INTERVAL = 3600
+
+# stored in PRAGMA user_version; files of another version are emptied. Version 2 dropped WITHOUT ROWID,
+# which stores the 1.5 KB vector blobs in the key b-tree and made bulk lookups several times slower
+_FORMAT_VERSION = 2
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (model name, SHA-256 of the normalized text).
+
+    Vectors live as float32 blobs in a SQLite file. When the stored vectors exceed max_bytes, the least
+    recently used entries are deleted. hits and misses count lookups since the cache was opened.
+    """
+
+    def __init__(self, path=None, max_bytes=2 * 1024 ** 3):
+        if path is None:
+            path = os.path.join(os.path.expanduser("~"), ".cache", "myutils", "embeddings.sqlite")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # a lost last commit after a power cut is fine for a cache
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != _FORMAT_VERSION:
+            with self._conn:
+                self._conn.execute("DROP TABLE IF EXISTS embeddings")
+            self._conn.execute(f"PRAGMA user_version = {_FORMAT_VERSION}")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (model TEXT NOT NULL, key TEXT NOT NULL, "
+                           "vector BLOB NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (model, key))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def key(text: str) -> str:
+        # the same text with different unicode normalization shares an entry; whitespace is kept, the model sees it
+        normalized = unicodedata.normalize("NFC", text)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: list[str]):
+        """
+        Returns (matrix, missing): a float32 matrix with one row per text, filled where the text is cached,
+        and the positions of the texts that are not. matrix is None if nothing was found, the dimension is
+        then unknown.
+        """
+        import numpy as np
+        positions = {}
+        for i, text in enumerate(texts):
+            positions.setdefault(self.key(text), []).append(i)
+        keys = list(positions)
+        matrix = None
+        found = 0
+        stale = []
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                for key, last_used, vector in self._conn.execute(
+                        f"SELECT key, last_used, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                        [model] + chunk):
+                    row = np.frombuffer(vector, dtype=np.float32)
+                    if matrix is None:
+                        matrix = np.empty((len(texts), len(row)), dtype=np.float32)
+                    matrix[positions[key]] = row
+                    found += len(positions[key])
+                    positions[key] = None
+                    if last_used < now - TOUCH_INTERVAL:
+                        stale.append(key)
+            if stale:
+                with self._conn:
+                    self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                                           [(now, model, key) for key in stale])
+            self.hits += found
+            self.misses += len(texts) - found
+        missing = sorted(i for rows in positions.values() if rows is not None for i in rows)
+        return matrix, missing
+
+    def put_many(self, model: str, texts: list[str], vectors):
+        import numpy as np
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        now = time.time()
+        rows = [(model, self.key(t), row.tobytes(), now) for t, row in zip(texts, matrix)]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._bytes += matrix.nbytes
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def get(self, model: str, text: str):
+        matrix, missing = self.get_many(model, [text])
+        return None if missing else matrix[0]
+
+    def put(self, model: str, text: str, vector):
+        self.put_many(model, [text], [vector])
+
+    def _evict(self):
+        # recount first, other processes may share the file
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        with self._conn:
+            while self._bytes > self.max_bytes:
+                oldest = self._conn.execute("SELECT model, key, LENGTH(vector) FROM embeddings "
+                                            "ORDER BY last_used LIMIT 1000").fetchall()
+                if not oldest:
+                    break
+                for model, key, size in oldest:
+                    if self._bytes <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM embeddings WHERE model = ? AND key = ?", (model, key))
+                    self._bytes -= size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "bytes": self._bytes}
+
+    def close(self):
+        self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    # shared per process; MYUTILS_EMBEDDING_CACHE sets the file, "off" disables caching (returns None)
+    global _default_cache
+    path = os.environ.get("MYUTILS_EMBEDDING_CACHE")
+    if path == "off":
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = EmbeddingCache(path)
+    return _default_cache
+
+
+def cached_embeddings(model: str, texts: list[str], compute, cache=None):
+    """
+    Looks texts up in the cache and calls compute(missing_texts) -> vectors (matrix or list of lists)
+    once for all misses. Returns a float32 matrix with one row per text.
+    Uses the default cache when cache is None; without a cache (MYUTILS_EMBEDDING_CACHE=off) everything
+    is computed.
+    """
+    import numpy as np
+    if cache is None:
+        cache = get_default_cache()
+    if cache is None:
+        return np.ascontiguousarray(compute(texts), dtype=np.float32)
+    matrix, missing = cache.get_many(model, texts)
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        computed = np.ascontiguousarray(compute(missing_texts), dtype=np.float32)
+        if matrix is None:
+            matrix = computed if len(missing) == len(texts) else np.empty((len(texts), computed.shape[1]),
+                                                                             dtype=np.float32)
+        if matrix is not computed:
+            matrix[missing] = computed
+        cache.put_many(model, missing_texts, computed)
+    if matrix is None:  # no texts
+        matrix = np.zeros((0, 0), dtype=np.float32)
+    return matrix
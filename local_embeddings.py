@@ -1,24 +1,184 @@
-from sentence_transformers import SentenceTransformer
-import numpy as np
+from __future__ import annotations
+
 import json
+import mmap
+import os
+import sys
+import threading
+from typing import TYPE_CHECKING
+
+from embedding_cache import cached_embeddings
+
+if TYPE_CHECKING:  # annotations only, see below
+    import numpy as np
+
+# numpy and sentence_transformers (torch) are imported inside the functions that need them,
+# so importing this module stays cheap for scripts that only use an unrelated helper
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model(device: str | None = None, threads: int | None = None):
+    # the SentenceTransformer is created on first use and shared by the whole process;
+    # device ("cpu", "cuda", ...) and threads (torch intra-op threads) only apply to that first call
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if threads:
+                    import torch
+                    torch.set_num_threads(threads)
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(MODEL_NAME, device=device)
+    return _model
+
+
+def warmup(device: str | None = None, threads: int | None = None):
+    # loads the model and runs one encode so the first real request does not pay for it
+    get_model(device, threads).encode(["warmup"])
+
+
+def __getattr__(name):
+    # keeps local_embeddings.model working for existing callers
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
+def _encode(texts: list[str], batch_size: int = 64):
+    return get_model().encode(texts, batch_size=batch_size, convert_to_numpy=True)
 
 
-def get_embedding(text: str) -> list:
-    return model.encode(text).tolist()
+def get_embedding(text: str, use_cache: bool = True) -> list:
+    if not use_cache:
+        return get_model().encode(text).tolist()
+    return cached_embeddings(MODEL_NAME, [text], _encode)[0].tolist()
 
 
-def get_embeddings(texts: list[str]) -> dict:
-    return {t: get_embedding(t) for t in texts}
+def get_embeddings(texts: list[str], batch_size: int = 64, use_cache: bool = True) -> tuple[np.ndarray, dict]:
+    # every distinct text is encoded once, in batches of batch_size, texts already in the
+    # embedding cache are not encoded at all
+    # returns a contiguous float32 matrix and a text -> row index
+    import numpy as np
+    index = {}
+    for t in texts:
+        index.setdefault(t, len(index))
+    if not index:
+        return np.zeros((0, get_model().get_sentence_embedding_dimension()), dtype=np.float32), index
+    if use_cache:
+        return cached_embeddings(MODEL_NAME, list(index), lambda missing: _encode(missing, batch_size)), index
+    return np.ascontiguousarray(_encode(list(index), batch_size), dtype=np.float32), index
 
 
-def list_to_vecstore(in_file):
+class VectorStore:
+    """
+    Binary vector store: <path>.f32 holds the raw float32 matrix (row-major), <path>.txt the utf-8 texts
+    back to back, <path>.offsets the int64 byte offsets of each text (n + 1 values) and <path>.json the
+    dimension. Vectors and texts are memory-mapped, so opening is instant and rows are paged in on demand.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path + ".json", "r") as f:
+            self.dim = json.load(f)["dim"]
+        self._map()
+
+    @classmethod
+    def create(cls, path, dim):
+        # creates an empty store, overwriting any existing one at path
+        import numpy as np
+        with open(path + ".json", "w") as f:
+            json.dump({"dim": dim, "dtype": "float32"}, f)
+        for suffix in (".f32", ".txt"):
+            open(path + suffix, "wb").close()
+        np.zeros(1, dtype=np.int64).tofile(path + ".offsets")
+        return cls(path)
+
+    def _map(self):
+        import numpy as np
+        rows = os.path.getsize(self.path + ".f32") // (4 * self.dim)
+        if rows:
+            self.vectors = np.memmap(self.path + ".f32", dtype=np.float32, mode="r", shape=(rows, self.dim))
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self.offsets = np.memmap(self.path + ".offsets", dtype=np.int64, mode="r", shape=(rows + 1,))
+        self._texts = None
+        if self.offsets[-1]:
+            with open(self.path + ".txt", "rb") as f:
+                self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def text(self, row: int) -> str:
+        return self._texts[self.offsets[row]:self.offsets[row + 1]].decode("utf-8") if self._texts else ""
+
+    def append(self, texts: list[str], matrix: np.ndarray):
+        import numpy as np
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if matrix.shape != (len(texts), self.dim):
+            raise ValueError(f"expected a ({len(texts)}, {self.dim}) matrix, got {matrix.shape}")
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = self.offsets[-1] + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+        with open(self.path + ".f32", "ab") as f:
+            matrix.tofile(f)
+        with open(self.path + ".txt", "ab") as f:
+            f.write(b"".join(encoded))
+        with open(self.path + ".offsets", "ab") as f:
+            offsets.tofile(f)
+        self._map()
+
+    def search(self, query, k: int = 10, chunk_size: int = 65536) -> list[tuple[str, float]]:
+        # exact top-k cosine search, chunk by chunk so only chunk_size rows are in memory at once
+        import numpy as np
+        q = np.asarray(query, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) or 1.0)
+        best_scores = np.zeros(0, dtype=np.float32)
+        best_rows = np.zeros(0, dtype=np.int64)
+        for start in range(0, len(self), chunk_size):
+            block = self.vectors[start:start + chunk_size]
+            norms = np.linalg.norm(block, axis=1)
+            norms[norms == 0] = 1.0
+            scores = (block @ q) / norms
+            top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+            best_scores = np.concatenate([best_scores, scores[top]])
+            best_rows = np.concatenate([best_rows, top + start])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k)[:k]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+        order = np.argsort(-best_scores)
+        return [(self.text(row), float(score)) for row, score in zip(best_rows[order], best_scores[order])]
+
+
+def list_to_vecstore(in_file, batch_size: int = 64, use_cache: bool = True) -> VectorStore:
     with open(in_file, "r") as f:
-        with open(in_file + "_vecstore", "w") as newfile:
-            json.dump(get_embeddings(f.readlines()), newfile)
+        texts = [line.rstrip("\r\n") for line in f]
+    matrix, index = get_embeddings(texts, batch_size, use_cache)
+    store = VectorStore.create(in_file + "_vecstore", matrix.shape[1])
+    store.append(list(index), matrix)
+    return store
+
+
+def search_vecstore(in_file, text: str, k: int = 10) -> list[tuple[str, float]]:
+    return VectorStore(in_file + "_vecstore").search(get_embedding(text), k)
+
+
+def import_benchmark() -> float:
+    # cumulative import time of this module in milliseconds, measured in a fresh interpreter
+    import subprocess
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import local_embeddings"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stderr
+    for line in output.splitlines():
+        if line.rstrip().endswith("| local_embeddings"):
+            return int(line.split("|")[1]) / 1000
+    raise RuntimeError("local_embeddings not found in -X importtime output")
 
 
 if __name__ == '__main__':
+    print(f"import local_embeddings: {import_benchmark():.1f} ms")
     #list_to_vecstore("kbob")
     print(get_embedding("Dieser Satz wird vektorisiert."))
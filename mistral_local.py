@@ -1,50 +1,159 @@
 from openai import OpenAI
 import base64
-
-
-def mistral_complete(prompt_text):
-    gpt_response = client.chat.completions.create(
-        model="TheBloke/Mistral-7B-Instruct-v0.1-GGUF",
-        messages=[{"role": "system",
-                   "content":   "Du bist ein hilfreicher assistent."},
-                  {"role": "user", "content": prompt_text}])
-    return gpt_response.choices[0].message.content
-
-
-def mistral_chat():
-    history = [
-        {"role": "system",
-         "content": "You are an intelligent assistant. You always provide well-reasoned answers that are "
-                    "both correct and helpful."},
-        {"role": "user",
-         "content": "Hello, introduce yourself to someone opening this program for the first time. Be concise."},
-    ]
-
-    while True:
+import time
+
+from completion_cache import cached_completion
+from embedding_cache import cached_embeddings
+
+client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
+
+EMBEDDING_MODEL = "nomic-ai/nomic-embed-text-v1.5-GGUF"
+CHAT_MODEL = "TheBloke/Mistral-7B-Instruct-v0.2-GGUF"
+
+
+def mistral_complete(prompt_text, use_cache=True):
+    model = "TheBloke/Mistral-7B-Instruct-v0.1-GGUF"
+    messages = [{"role": "system",
+                 "content":   "Du bist ein hilfreicher assistent."},
+                {"role": "user", "content": prompt_text}]
+
+    def compute():
+        gpt_response = client.chat.completions.create(model=model, messages=messages)
+        return gpt_response.choices[0].message.content
+
+    return cached_completion(model, messages, compute, use_cache=use_cache)
+
+
+def mistral_embedding(text, use_cache=True):
+    # embeddings from the embedding model loaded in LM Studio, cached like the OpenAI and local ones
+    def compute(texts):
+        response = client.embeddings.create(input=texts, model=EMBEDDING_MODEL)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    if not use_cache:
+        return compute([text])[0]
+    return cached_embeddings(EMBEDDING_MODEL, [text], compute)[0].tolist()
+
+
+def estimate_tokens(text):
+    # no tokenizer for the local model, about 4 characters per token
+    return len(text) // 4 + 1
+
+
+class ConversationManager:
+    """
+    Chat history that stays within a token budget.
+
+    The system prompt is always the first message and never changes, so the local server can reuse its
+    prompt cache for it. When the history plus reserve_tokens for the answer exceeds max_tokens, the oldest
+    turns are dropped until the history is below low_watermark of the budget; dropping more than needed
+    keeps the prefix unchanged for the next few turns instead of shifting it every turn. With summarize=True
+    the dropped turns are folded into a short summary that is sent after the system prompt.
+    stats holds prompt_tokens, completion_tokens, ttft (time to first token) and seconds per turn;
+    the token counts are estimates unless the server reports usage.
+    """
+
+    def __init__(self, system_prompt, max_tokens=4096, reserve_tokens=1024, summarize=False, low_watermark=0.6,
+                 model=CHAT_MODEL, temperature=0.7):
+        self.system = {"role": "system", "content": system_prompt}
+        self.max_tokens = max_tokens
+        self.reserve_tokens = reserve_tokens
+        self.summarize = summarize
+        self.low_watermark = low_watermark
+        self.model = model
+        self.temperature = temperature
+        self.turns = []
+        self.summary = ""
+        self.stats = []
+
+    @staticmethod
+    def _message_tokens(message):
+        return estimate_tokens(message["content"]) + 4  # role and template tokens
+
+    def messages(self):
+        messages = [self.system]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        return messages + self.turns
+
+    def prompt_tokens(self):
+        return sum(self._message_tokens(m) for m in self.messages())
+
+    def _fit(self):
+        budget = self.max_tokens - self.reserve_tokens
+        if self.prompt_tokens() <= budget:
+            return
+        evicted = []
+        # the newest message (the current question) is always kept
+        while len(self.turns) > 1 and (self.prompt_tokens() > budget * self.low_watermark
+                                       or self.turns[0]["role"] != "user"):
+            evicted.append(self.turns.pop(0))
+        if evicted and self.summarize:
+            self.summary = self._summarize(evicted)
+
+    def _summarize(self, evicted):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in evicted)
+        if self.summary:
+            transcript = f"Earlier summary: {self.summary}\n{transcript}"
+        response = client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user",
+                       "content": "Summarize this conversation in a few sentences, keep names, numbers and "
+                                  f"decisions:\n{transcript}"}],
+            temperature=0.2,
+            max_tokens=256,
+        )
+        return response.choices[0].message.content
+
+    def ask(self, text, print_out=True):
+        """Sends text with the fitted history, streams the answer and returns it."""
+        self.turns.append({"role": "user", "content": text})
+        start = time.perf_counter()
+        self._fit()
+        prompt_tokens = self.prompt_tokens()
+        request_start = time.perf_counter()
         completion = client.chat.completions.create(
-            model="TheBloke/Mistral-7B-Instruct-v0.2-GGUF",
-            messages=history,
-            temperature=0.7,
+            model=self.model,
+            messages=self.messages(),
+            temperature=self.temperature,
             stream=True,
+            stream_options={"include_usage": True},  # usage arrives in a last chunk without choices
         )
 
-        new_message = {"role": "assistant", "content": ""}
-
+        parts = []
+        ttft = None
+        usage = None
         for chunk in completion:
-            if chunk.choices[0].delta.content:
-                print(chunk.choices[0].delta.content, end="", flush=True)
-                new_message["content"] += chunk.choices[0].delta.content
+            if chunk.choices and chunk.choices[0].delta.content:
+                if ttft is None:
+                    ttft = time.perf_counter() - request_start
+                if print_out:
+                    print(chunk.choices[0].delta.content, end="", flush=True)
+                parts.append(chunk.choices[0].delta.content)
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+        answer = "".join(parts)
+        self.turns.append({"role": "assistant", "content": answer})
+        self.stats.append({"prompt_tokens": usage.prompt_tokens if usage else prompt_tokens,
+                           "completion_tokens": usage.completion_tokens if usage else estimate_tokens(answer),
+                           "estimated": usage is None, "ttft": ttft, "seconds": time.perf_counter() - start})
+        return answer
+
+
+def mistral_chat(max_tokens=4096, summarize=True, show_stats=False):
+    conversation = ConversationManager(
+        "You are an intelligent assistant. You always provide well-reasoned answers that are "
+        "both correct and helpful.",
+        max_tokens=max_tokens, summarize=summarize)
+    text = "Hello, introduce yourself to someone opening this program for the first time. Be concise."
 
-        history.append(new_message)
-
-        # Uncomment to see chat history
-        # import json
-        # gray_color = "\033[90m"
-        # reset_color = "\033[0m"
-        # print(f"{gray_color}\n{'-'*20} History dump {'-'*20}\n")
-        # print(json.dumps(history, indent=2))
-        # print(f"\n{'-'*55}\n{reset_color}")
-        history.append({"role": "user", "content": input("> ")})
+    while True:
+        conversation.ask(text)
+        if show_stats:
+            gray_color = "\033[90m"
+            reset_color = "\033[0m"
+            print(f"\n{gray_color}{conversation.stats[-1]}{reset_color}")
+        text = input("> ")
 
 
 def mistral_vision():
@@ -100,7 +209,7 @@ def mistral_vision():
 
 
 if __name__ == '__main__':
-    client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
+    pass
     #print(mistral_complete(input()))
     #mistral_chat()
     #mistral_vision()
@@ -1,5 +1,13 @@
-from neo4j import GraphDatabase
+from neo4j import READ_ACCESS, AsyncGraphDatabase, GraphDatabase
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import asyncio
+import itertools
 import os
+import threading
+import time
+
+SUMMARY_COUNTERS = ("nodes_created", "nodes_deleted", "relationships_created", "relationships_deleted",
+                    "properties_set", "labels_added")
 
 class Neo4jHandler:
     def __init__(self, uri, user, password):
@@ -10,14 +18,104 @@ class Neo4jHandler:
 
     def write_data(self, query, parameters=None):
         with self.driver.session() as session:
-            result = session.write_transaction(self._execute_write_query, query, parameters)
+            result = session.execute_write(self._execute_write_query, query, parameters)
             return result
 
     def read_data(self, query, parameters=None):
         with self.driver.session() as session:
-            result = session.read_transaction(self._execute_read_query, query, parameters)
+            result = session.execute_read(self._execute_read_query, query, parameters)
             return result
 
+    def stream_data(self, query, parameters=None, fetch_size=1000, batch_size=None, row_format="dict"):
+        """
+        Yields the result of a read query while it is being fetched, instead of building a list like read_data.
+
+        The driver pulls fetch_size records per round trip, so at most about one fetch is buffered. The
+        transaction stays open until the generator is exhausted or closed, so consume it promptly.
+
+        :param batch_size: None yields single rows, otherwise lists of up to batch_size rows.
+        :param row_format: "dict" (record.data(), nodes become dicts), "tuple" (the record values in column
+            order, nodes stay driver objects) or "columns" (per batch a dict column -> list of values;
+            batch_size defaults to fetch_size).
+        """
+        if row_format not in ("dict", "tuple", "columns"):
+            raise ValueError(f"unknown row_format {row_format!r}")
+        if row_format == "columns" and batch_size is None:
+            batch_size = fetch_size
+        with self.driver.session(fetch_size=fetch_size, default_access_mode=READ_ACCESS) as session:
+            with session.begin_transaction() as tx:
+                result = tx.run(query, parameters)
+                keys = result.keys()
+                if row_format == "dict":
+                    rows = (record.data() for record in result)
+                else:
+                    rows = (tuple(record) for record in result)
+                if batch_size is None:
+                    yield from rows
+                    return
+                for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+                    if row_format == "columns":
+                        yield dict(zip(keys, map(list, zip(*batch))))
+                    else:
+                        yield batch
+
+    def bulk_write(self, query, rows, batch_size=1000, workers=4):
+        """
+        Writes many rows with one query per batch instead of one query per row.
+
+        The query is run as UNWIND $rows AS row <query> (the UNWIND is added if the query does not start with
+        it), so it refers to the current row as row. Batches run in parallel on a thread pool; every worker
+        keeps one session for all of its batches. Only workers * 2 batches are held in memory at a time,
+        so rows can be a generator. Transient errors such as lock deadlocks are retried by execute_write.
+
+        :param query: Cypher for a single row, e.g. "MERGE (p:Person {name: row.name})".
+        :param rows: Iterable of dicts.
+        :param batch_size: Rows per transaction.
+        :param workers: Parallel transactions; use 1 when batches lock the same nodes.
+        :return: dict with rows, batches, seconds and the summed counters (nodes_created, ...).
+        """
+        if not query.lstrip().upper().startswith("UNWIND"):
+            query = "UNWIND $rows AS row " + query
+        start = time.perf_counter()
+        local = threading.local()
+        sessions = []
+        sessions_lock = threading.Lock()
+        totals = dict.fromkeys(SUMMARY_COUNTERS, 0)
+        totals.update(rows=0, batches=0)
+
+        def run(batch):
+            if not hasattr(local, "session"):
+                local.session = self.driver.session()
+                with sessions_lock:
+                    sessions.append(local.session)
+            summary = local.session.execute_write(self._execute_write_query, query, {"rows": batch})
+            return len(batch), summary.counters
+
+        def collect(done):
+            for future in done:
+                count, counters = future.result()
+                totals["rows"] += count
+                totals["batches"] += 1
+                for name in SUMMARY_COUNTERS:
+                    totals[name] += getattr(counters, name)
+
+        rows = iter(rows)
+        pending = set()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+                    pending.add(executor.submit(run, batch))
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                done, pending = wait(pending)
+                collect(done)
+        finally:
+            for session in sessions:
+                session.close()
+        totals["seconds"] = time.perf_counter() - start
+        return totals
+
     @staticmethod
     def _execute_write_query(tx, query, parameters):
         result = tx.run(query, parameters)
@@ -28,6 +126,116 @@ class Neo4jHandler:
         result = tx.run(query, parameters)
         return [record.data() for record in result]
 
+class AsyncNeo4jHandler:
+    """
+    Neo4jHandler on the asyncio driver, for running many independent queries at the same time.
+
+    max_connection_pool_size limits the connections the driver opens; gather_reads runs at most
+    max_concurrency queries at once (default: the pool size), so a large fan-out waits on the semaphore
+    instead of on the pool's connection acquisition timeout.
+    """
+
+    def __init__(self, uri, user, password, max_connection_pool_size=50, max_concurrency=None):
+        self.driver = AsyncGraphDatabase.driver(uri, auth=(user, password),
+                                                max_connection_pool_size=max_connection_pool_size)
+        self.max_concurrency = max_concurrency or max_connection_pool_size
+
+    async def close(self):
+        await self.driver.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def write_data(self, query, parameters=None):
+        async with self.driver.session() as session:
+            return await session.execute_write(self._execute_write_query, query, parameters)
+
+    async def read_data(self, query, parameters=None):
+        async with self.driver.session() as session:
+            return await session.execute_read(self._execute_read_query, query, parameters)
+
+    async def gather_reads(self, queries, max_concurrency=None):
+        """
+        Runs independent read queries concurrently, each in its own session and transaction.
+
+        :param queries: Query strings or (query, parameters) tuples.
+        :return: List of read_data results in the order of queries.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def run(item):
+            query, parameters = (item, None) if isinstance(item, str) else item
+            async with semaphore:
+                return await self.read_data(query, parameters)
+
+        return await asyncio.gather(*(run(item) for item in queries))
+
+    @staticmethod
+    async def _execute_write_query(tx, query, parameters):
+        result = await tx.run(query, parameters)
+        return await result.consume()
+
+    @staticmethod
+    async def _execute_read_query(tx, query, parameters):
+        result = await tx.run(query, parameters)
+        return await result.data()
+
+def ifc_structure_to_batches(structure):
+    """
+    Turns the output of extract_structure (IFC-checker.py) into rows for Neo4jHandler.bulk_write.
+
+    :param structure: dict IFC type -> list of IfcProduct instances.
+    :return: (nodes, relationships): nodes maps each IFC type to rows {GlobalId, Name, ObjectType};
+        relationships maps CONTAINED_IN (IfcRelContainedInSpatialStructure) and PART_OF (IfcRelAggregates)
+        to rows {child, parent} of GlobalIds.
+    """
+    nodes = {}
+    relationships = {"CONTAINED_IN": [], "PART_OF": []}
+    for ifc_type, elements in structure.items():
+        rows = nodes.setdefault(ifc_type, [])
+        for element in elements:
+            rows.append({"GlobalId": element.GlobalId, "Name": element.Name,
+                         "ObjectType": getattr(element, "ObjectType", None)})
+            for rel in getattr(element, "ContainedInStructure", None) or ():
+                relationships["CONTAINED_IN"].append({"child": element.GlobalId,
+                                                      "parent": rel.RelatingStructure.GlobalId})
+            for rel in getattr(element, "Decomposes", None) or ():
+                if rel.is_a("IfcRelAggregates"):
+                    relationships["PART_OF"].append({"child": element.GlobalId,
+                                                     "parent": rel.RelatingObject.GlobalId})
+    return nodes, relationships
+
+
+def load_ifc_structure(handler, structure, batch_size=1000, workers=4):
+    """
+    Loads an extract_structure result into Neo4j as (:IfcProduct:<IfcType>) nodes and
+    CONTAINED_IN / PART_OF relationships, using bulk_write.
+
+    Nodes are written with the given number of workers. Relationships are written with a single worker,
+    because many of them end on the same storey or building and parallel batches would only wait for each
+    other's locks.
+
+    :return: dict of bulk_write results per node type and relationship type.
+    """
+    handler.write_data("CREATE CONSTRAINT ifc_product_global_id IF NOT EXISTS "
+                       "FOR (n:IfcProduct) REQUIRE n.GlobalId IS UNIQUE")
+    nodes, relationships = ifc_structure_to_batches(structure)
+    results = {}
+    for ifc_type, rows in nodes.items():
+        # IFC type names are schema identifiers, safe to use as a label
+        results[ifc_type] = handler.bulk_write(
+            f"MERGE (n:IfcProduct {{GlobalId: row.GlobalId}}) SET n:`{ifc_type}`, "
+            "n.name = row.Name, n.object_type = row.ObjectType", rows, batch_size, workers)
+    for rel_type, rows in relationships.items():
+        results[rel_type] = handler.bulk_write(
+            "MATCH (c:IfcProduct {GlobalId: row.child}), (p:IfcProduct {GlobalId: row.parent}) "
+            f"MERGE (c)-[:{rel_type}]->(p)", rows, batch_size, workers=1)
+    return results
+
+
 # Usage example
 if __name__ == "__main__":
     # Connect to the database
@@ -56,3 +264,10 @@ if __name__ == "__main__":
 
     # Close the connection
     neo4j_handler.close()
+
+    # Many independent reads at once
+    async def dashboard():
+        async with AsyncNeo4jHandler(uri, user, password) as handler:
+            return await handler.gather_reads([("MATCH (p:Person {name: $name}) RETURN p.age AS age",
+                                                {"name": name}) for name in ("Alice", "Bob")])
+    print("Async reads:", asyncio.run(dashboard()))
@@ -1,10 +1,138 @@
 import os
-from openai import OpenAI
+import asyncio
+import csv
+import io
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from openai import AsyncOpenAI, OpenAI, RateLimitError
+import numpy as np
 import requests
 import base64
+from requests.adapters import HTTPAdapter
+
+from completion_cache import cached_completion, cached_completion_async
+from embedding_cache import cached_embeddings, get_default_cache
+
+try:
+    import tiktoken
+except ImportError:  # optional, token counts fall back to an estimate
+    tiktoken = None
+
+try:
+    from PIL import Image
+except ImportError:  # optional, images are then sent unchanged
+    Image = None
 
 client = OpenAI()
 
+EMBEDDING_MODEL = "text-embedding-ada-002"
+_encodings = {}
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+_async_client_options = {}
+_http = None  # requests.Session for the plain REST calls, see get_http_session()
+_http_lock = threading.Lock()
+
+IMAGE_CHUNK_SIZE = 3 * 256 * 1024  # a multiple of 3, so the base64 of the chunks can be concatenated
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp")
+
+
+def get_http_session():
+    """
+    Returns the shared requests.Session for calls that do not go through the openai client.
+    Its connection pool keeps connections to api.openai.com alive between calls and threads.
+    """
+    global _http
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+                session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+                _http = session
+    return _http
+
+
+def prepare_image(image, detail="high", quality=85):
+    """
+    Scales an image down to the resolution the vision model works with and re-encodes it as JPEG.
+
+    low: fits into 512x512. high/auto: fits into 2048x2048, then the shortest side is at most 768.
+    Larger images are only bigger uploads, the model scales them down the same way.
+
+    Args:
+    image (str, bytes or file object): path or content of the image.
+    detail (str): "low", "high" or "auto".
+    quality (int): JPEG quality.
+
+    Returns:
+    bytes: JPEG content; the unchanged content if Pillow is not installed.
+    """
+    if Image is None:
+        return _read_image(image)
+    source = io.BytesIO(image) if isinstance(image, (bytes, bytearray)) else image
+    with Image.open(source) as img:
+        if detail == "low":
+            img.thumbnail((512, 512))
+        else:
+            img.thumbnail((2048, 2048))
+            shortest = min(img.size)
+            if shortest > 768:
+                img = img.resize((round(img.width * 768 / shortest), round(img.height * 768 / shortest)))
+        if img.mode != "RGB":
+            # transparent areas become white instead of black
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, "white")
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def _read_image(image):
+    if isinstance(image, (bytes, bytearray)):
+        return bytes(image)
+    if hasattr(image, "read"):
+        return image.read()
+    with open(image, "rb") as image_file:
+        return image_file.read()
+
+
+def encode_image(image, detail=None, quality=85):
+    """
+    Base64 encodes an image, optionally reduced with prepare_image first.
+
+    Files are read and encoded in chunks of IMAGE_CHUNK_SIZE bytes, so the raw content is never held
+    in memory as a whole next to its base64 string.
+
+    Args:
+    image (str, bytes or file object): path or content of the image.
+    detail (str): None sends the image as it is; "low", "high" or "auto" downsizes it to that detail level.
+
+    Returns:
+    str: the Base64 encoded image.
+    """
+    if detail is not None:
+        image = prepare_image(image, detail, quality)
+    if isinstance(image, (bytes, bytearray)):
+        return base64.b64encode(image).decode('utf-8')
+    if hasattr(image, "read"):
+        # read() may return fewer bytes than asked (raw files, sockets); only whole 3-byte groups are
+        # encoded per chunk and the rest is carried over, so no padding ends up inside the string
+        parts, rest = [], b""
+        for chunk in iter(lambda: image.read(IMAGE_CHUNK_SIZE), b""):
+            chunk = rest + chunk
+            cut = len(chunk) - len(chunk) % 3
+            parts.append(base64.b64encode(chunk[:cut]).decode('utf-8'))
+            rest = chunk[cut:]
+        parts.append(base64.b64encode(rest).decode('utf-8'))
+        return "".join(parts)
+    with open(image, "rb") as image_file:
+        return encode_image(image_file)
+
 
 def image_bytes_to_base64(image_bytes):
     """
@@ -16,37 +144,107 @@ def image_bytes_to_base64(image_bytes):
     Returns:
     str: A Base64 encoded string of the image.
     """
-    return base64.b64encode(image_bytes).decode('utf-8')
+    return encode_image(image_bytes)
 
 
 def image_to_base64(image_path):
-    with open(image_path, "rb") as image_file:
-        return str(base64.b64encode(image_file.read()).decode('utf-8'))
+    return encode_image(image_path)
+
+
+def _classifier_messages(prompt_text):
+    return [{"role": "system",
+             "content":   "Du bist eine Maschine, die Dokumente klassifiziert."},
+            {"role": "user", "content": prompt_text}]
 
 
-def gpt4_new(prompt_text):
-    gpt_response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "system",
-                   "content":   "Du bist eine Maschine, die Dokumente klassifiziert."},
-                  {"role": "user", "content": prompt_text}])
-    return gpt_response.choices[0].message.content
+def gpt4_new(prompt_text, use_cache=True):
+    # identical prompts are answered from the completion cache, see completion_cache.py
+    messages = _classifier_messages(prompt_text)
 
+    def compute():
+        gpt_response = client.chat.completions.create(model="gpt-4", messages=messages)
+        return gpt_response.choices[0].message.content
 
-def vectorize_data(data_input):
+    return cached_completion("gpt-4", messages, compute, use_cache=use_cache)
+
+
+def count_tokens(text, model=EMBEDDING_MODEL):
+    """
+    Counts the tokens of a text with tiktoken, or estimates them (4 characters per token) without it.
+    """
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+    return len(_encodings[model].encode(text, disallowed_special=()))
+
+
+def _embedding_batches(texts, max_items, max_tokens):
+    # yields lists of positions into texts, each within max_items inputs and max_tokens tokens
+    batch, batch_tokens = [], 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def _embed_batched(texts, max_items=2048, max_tokens=100_000):
+    # one embeddings request per batch, data[i] is mapped back to its text via its index
+    vectors = [None] * len(texts)
+    for batch in _embedding_batches(texts, max_items, max_tokens):
+        response = client.embeddings.create(input=[texts[i] for i in batch], model=EMBEDDING_MODEL)
+        for item in response.data:
+            vectors[batch[item.index]] = item.embedding
+    return vectors
+
+
+def vectorize_data(data_input, as_matrix=False, max_items=2048, max_tokens=100_000, use_cache=True):
+    """
+    Embeds a string or a list of items.
+
+    A list is deduplicated and sent in batches of at most max_items inputs and max_tokens tokens, one request
+    per batch; each data[i].embedding is mapped back to its item via its index. Texts already in the
+    embedding cache (embedding_cache.py) are not sent at all.
+
+    Args:
+    data_input (str | list): text, or items that are embedded as str(item).
+    as_matrix (bool): for lists, return a float32 matrix with one row per item instead of a dict.
+    max_items (int): inputs per request (the API allows 2048).
+    max_tokens (int): tokens per request.
+    use_cache (bool): look up and store the vectors in the embedding cache.
+
+    Returns:
+    list | dict | np.ndarray: the vector for a string, {str(item): vector} or the matrix for a list.
+    """
     # input can be list or string:
 
     if isinstance(data_input, list):
+        texts = [str(item) for item in data_input]
+        unique = list(dict.fromkeys(texts))
+        if use_cache:
+            vectors = cached_embeddings(EMBEDDING_MODEL, unique,
+                                        lambda missing: _embed_batched(missing, max_items, max_tokens))
+        else:
+            vectors = np.asarray(_embed_batched(unique, max_items, max_tokens), dtype=np.float32)
+        if as_matrix:
+            rows = {text: row for row, text in enumerate(unique)}
+            return vectors[[rows[text] for text in texts]]
         # returning a dictionary
-        my_dict = {}
-        for item in data_input:
-            my_dict[str(item)] = client.embeddings.create(input=data_input,
-                                                          model="text-embedding-ada-002").data[0].embedding
-        return my_dict
+        return dict(zip(unique, vectors.tolist()))
 
     elif isinstance(data_input, str):
         # returning just the vector
-        return client.embeddings.create(input=data_input, model="text-embedding-ada-002").data[0].embedding
+        if use_cache:
+            return cached_embeddings(EMBEDDING_MODEL, [data_input], _embed_batched)[0].tolist()
+        return client.embeddings.create(input=data_input, model=EMBEDDING_MODEL).data[0].embedding
 
     else:
         print("none")
@@ -65,7 +263,11 @@ def img_create(prompt="a nice house on the beach", download_path=""):
     return my_url
 
 
-def img_to_text(img_url="", img_base64="", prompt="What’s in this image?", print_out=True):
+def img_to_text(img_url="", img_base64="", prompt="What’s in this image?", print_out=True, img_path="",
+                detail="auto"):
+    # img_path is downsized to the detail level (prepare_image) and sent like img_base64
+    if img_path and not img_url and not img_base64:
+        img_base64 = encode_image(img_path, detail)
     if img_url:
         img_desc_response = client.chat.completions.create(
             model="gpt-4-turbo",
@@ -78,6 +280,7 @@ def img_to_text(img_url="", img_base64="", prompt="What’s in this image?", pri
                             "type": "image_url",
                             "image_url": {
                                 "url": img_url,
+                                "detail": detail,
                             },
                         },
                     ],
@@ -106,7 +309,8 @@ def img_to_text(img_url="", img_base64="", prompt="What’s in this image?", pri
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{img_base64}"
+                                "url": f"data:image/jpeg;base64,{img_base64}",
+                                "detail": detail
                             }
                         }
                     ]
@@ -114,7 +318,8 @@ def img_to_text(img_url="", img_base64="", prompt="What’s in this image?", pri
             ],
             "max_tokens": 300
         }
-        img_desc_response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
+        img_desc_response = get_http_session().post(f"{client.base_url}chat/completions", headers=headers,
+                                                    json=payload)
         if print_out:
             print(img_desc_response.json()["choices"][0]["message"]["content"])
         return img_desc_response.json()["choices"][0]["message"]["content"]
@@ -123,16 +328,57 @@ def img_to_text(img_url="", img_base64="", prompt="What’s in this image?", pri
 
 
 def encode_image_to_base64(image_path):
-    with open(image_path, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-    return encoded_string
+    return encode_image(image_path)
+
+
+def describe_images(directory, prompt="What’s in this image?", detail="low", max_workers=4, print_out=False):
+    """
+    Describes all images in a directory with img_to_text, at most max_workers requests at a time.
+
+    Args:
+    directory (str): folder with the images (IMAGE_EXTENSIONS), not recursive.
+    detail (str): detail level for prepare_image and the model; "low" is the fastest and cheapest.
+
+    Returns:
+    dict: file name -> description, or the exception if that image failed.
+    """
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS))
+
+    def describe(name):
+        return img_to_text(prompt=prompt, print_out=False, img_path=os.path.join(directory, name), detail=detail)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(describe, name) for name in names}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+            if print_out:
+                print(f"{name}: {results[name]}")
+    return results
 
 
 def table_to_text(table=None, prompt="describe this table in plain text. "
                                      "be as precise as possible. spare no detail. "
-                                     "what is in this table?", print_out=True):
+                                     "what is in this table?", print_out=True, chunked=False, block_tokens=2000,
+                  limit=8):
+    """
+    Describes a table with gpt-4.
+
+    Args:
+    table: anything printable; with chunked=True a list of rows, CSV text or a pandas-like object.
+    chunked (bool): use table_to_text_chunked (map-reduce over row blocks) for tables too large for one prompt.
+    block_tokens (int), limit (int): passed on to table_to_text_chunked.
+    """
     if table is not None:
-        response = gpt4_new(f"{prompt} TABLE: {table}")
+        if chunked:
+            response, report = asyncio.run(table_to_text_chunked(table, prompt, block_tokens, limit))
+            if print_out:
+                print(report)
+        else:
+            response = gpt4_new(f"{prompt} TABLE: {table}")
         if print_out:
             print(response)
         return response
@@ -140,6 +386,273 @@ def table_to_text(table=None, prompt="describe this table in plain text. "
         return ValueError
 
 
+def _table_lines(table):
+    # (header line, row lines) as CSV; accepts a pandas-like object (to_csv), CSV text or a list of rows,
+    # where the rows are dicts or sequences with the header as first row
+    if hasattr(table, "to_csv"):
+        table = table.to_csv(index=False)
+    if isinstance(table, str):
+        rows = list(csv.reader(io.StringIO(table)))
+    elif table and isinstance(table[0], dict):
+        columns = list(table[0])
+        rows = [columns] + [[row.get(c) for c in columns] for row in table]
+    else:
+        rows = list(table)
+    lines = []
+    for row in rows:
+        out = io.StringIO()
+        csv.writer(out, lineterminator="").writerow(row)
+        lines.append(out.getvalue())
+    if not lines:
+        raise ValueError("table has no rows")
+    return lines[0], lines[1:]
+
+
+def _token_groups(parts, max_tokens, model, min_size=1):
+    # consecutive groups of parts within max_tokens; a group takes at least min_size parts even if over budget
+    groups, group, group_tokens = [], [], 0
+    for part in parts:
+        tokens = count_tokens(part, model)
+        if len(group) >= min_size and group_tokens + tokens > max_tokens:
+            groups.append(group)
+            group, group_tokens = [], 0
+        group.append(part)
+        group_tokens += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+
+async def _chat_with_usage(prompt_text, model):
+    response = await get_async_client().chat.completions.create(model=model,
+                                                                 messages=_classifier_messages(prompt_text))
+    usage = response.usage
+    return (response.choices[0].message.content,
+            usage.prompt_tokens if usage else 0, usage.completion_tokens if usage else 0)
+
+
+async def table_to_text_chunked(table, prompt="describe this table in plain text. "
+                                              "be as precise as possible. spare no detail. "
+                                              "what is in this table?", block_tokens=2000, limit=8,
+                                rate_limiter=None, model="gpt-4"):
+    """
+    Describes a large table with map-reduce: the rows are split into blocks of about block_tokens tokens,
+    each with the header line, the blocks are described concurrently (map), and the block descriptions are
+    combined into one (reduce, repeated in groups if they do not fit into one prompt).
+
+    Args:
+    table: list of rows (dicts, or sequences with the header first), CSV text or a pandas-like object.
+    block_tokens (int): token budget of the rows in one block, also the budget of one reduce prompt.
+    limit (int), rate_limiter (TokenBucket): as in map_concurrently.
+
+    Returns:
+    tuple: (description, report); report has blocks and, per stage (map, reduce), calls, seconds,
+    prompt_tokens and completion_tokens.
+    """
+    start = time.perf_counter()
+    header, lines = _table_lines(table)
+    blocks = ["\n".join([header] + group) for group in _token_groups(lines, block_tokens, model)] or [header]
+    report = {"blocks": len(blocks)}
+
+    def stage(name, results, stage_start):
+        report[name] = {"calls": len(results), "seconds": time.perf_counter() - stage_start,
+                        "prompt_tokens": sum(r[1] for r in results),
+                        "completion_tokens": sum(r[2] for r in results)}
+
+    async def describe(block):
+        return await _chat_with_usage(f"{prompt} This is one part of a larger table, the first line is the "
+                                      f"header. TABLE:\n{block}", model)
+
+    async def combine(parts):
+        joined = "\n\n".join(f"PART {i + 1}:\n{part}" for i, part in enumerate(parts))
+        return await _chat_with_usage(f"These are descriptions of consecutive parts of one table. Combine them "
+                                      f"into one description of the whole table; {prompt}\n\n{joined}", model)
+
+    def cost(text):
+        return count_tokens(text, model)
+
+    map_start = time.perf_counter()
+    results = await map_concurrently(describe, blocks, limit, rate_limiter, cost)
+    stage("map", results, map_start)
+
+    reduce_start = time.perf_counter()
+    parts, reduced = [r[0] for r in results], []
+    while len(parts) > 1:
+        groups = _token_groups(parts, block_tokens, model, min_size=2)
+        results = await map_concurrently(combine, groups, limit, rate_limiter,
+                                         lambda group: sum(map(cost, group)))
+        reduced.extend(results)
+        parts = [r[0] for r in results]
+    stage("reduce", reduced, reduce_start)
+    report["seconds"] = time.perf_counter() - start
+    return parts[0], report
+
+
+def get_async_client():
+    """
+    Returns the AsyncOpenAI client of the running event loop, created on first use.
+    The client's connections belong to one loop, so every asyncio.run() gets its own.
+    Its own retries are disabled, map_concurrently handles 429s with the rate limiter in mind.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = AsyncOpenAI(max_retries=0, **_async_client_options)
+    return _async_clients[loop]
+
+
+class TokenBucket:
+    """
+    Rate limiter for requests per minute (rpm) and tokens per minute (tpm).
+
+    Both budgets refill continuously; acquire(tokens) waits until one request and the given number of
+    tokens are available, so bursts are smoothed to the account limits instead of running into 429s.
+    """
+
+    def __init__(self, rpm=500, tpm=150_000):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens=1):
+        tokens = min(tokens, self.tpm)
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                elapsed = now - self._updated
+                self._updated = now
+                self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+                self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max((1 - self._requests) * 60 / self.rpm, (tokens - self._tokens) * 60 / self.tpm)
+            await asyncio.sleep(wait)
+
+
+def _retry_delay(error, attempt, base=1.0, cap=60.0):
+    # honours Retry-After when the server sends it, otherwise exponential backoff with full jitter
+    retry_after = error.response.headers.get("retry-after") if getattr(error, "response", None) else None
+    try:
+        return float(retry_after) + random.uniform(0, base)
+    except (TypeError, ValueError):
+        return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def map_concurrently(func, items, limit=16, rate_limiter=None, cost=None, max_retries=6):
+    """
+    Awaits func(item) for all items with at most limit calls in flight.
+
+    Args:
+    func (coroutine function): called with one item.
+    items (iterable): inputs.
+    limit (int): maximum concurrent calls.
+    rate_limiter (TokenBucket): optional, acquired before every attempt.
+    cost (callable): estimated tokens of an item for the rate limiter, default 1.
+    max_retries (int): retries per item after a 429 (RateLimitError).
+
+    Returns:
+    list: results in the order of items.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item):
+        async with semaphore:
+            for attempt in range(max_retries + 1):
+                if rate_limiter is not None:
+                    await rate_limiter.acquire(cost(item) if cost else 1)
+                try:
+                    return await func(item)
+                except RateLimitError as e:
+                    if attempt == max_retries:
+                        raise
+                    await asyncio.sleep(_retry_delay(e, attempt))
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+async def gpt4_new_async(prompt_text, use_cache=True):
+    messages = _classifier_messages(prompt_text)
+
+    async def compute():
+        gpt_response = await get_async_client().chat.completions.create(model="gpt-4", messages=messages)
+        return gpt_response.choices[0].message.content
+
+    return await cached_completion_async("gpt-4", messages, compute, use_cache=use_cache)
+
+
+async def img_to_text_async(img_url="", img_base64="", prompt="What’s in this image?", print_out=False):
+    if not img_url and not img_base64:
+        return ValueError
+    url = img_url or f"data:image/jpeg;base64,{img_base64}"
+    img_desc_response = await get_async_client().chat.completions.create(
+        model="gpt-4-turbo",
+        messages=[{"role": "user",
+                   "content": [{"type": "text", "text": prompt},
+                               {"type": "image_url", "image_url": {"url": url}}]}],
+        max_tokens=500,
+    )
+    if print_out:
+        print(img_desc_response.choices[0].message.content)
+    return img_desc_response.choices[0].message.content
+
+
+async def table_to_text_async(table=None, prompt="describe this table in plain text. "
+                                                 "be as precise as possible. spare no detail. "
+                                                 "what is in this table?", print_out=False):
+    if table is None:
+        return ValueError
+    response = await gpt4_new_async(f"{prompt} TABLE: {table}")
+    if print_out:
+        print(response)
+    return response
+
+
+async def vectorize_data_async(data_input, as_matrix=False, max_items=2048, max_tokens=100_000, use_cache=True,
+                               limit=8, rate_limiter=None):
+    """
+    Async vectorize_data: the batches of a list are sent concurrently through map_concurrently.
+    Same arguments and return values as vectorize_data, plus limit and rate_limiter for the batches.
+    """
+    texts = [data_input] if isinstance(data_input, str) else [str(item) for item in data_input]
+    unique = list(dict.fromkeys(texts))
+    cache = get_default_cache() if use_cache else None
+    if cache:
+        vectors, missing = cache.get_many(EMBEDDING_MODEL, unique)
+    else:
+        vectors, missing = None, list(range(len(unique)))
+    computed = [None] * len(missing)
+
+    async def embed(batch):
+        response = await get_async_client().embeddings.create(input=[unique[missing[i]] for i in batch],
+                                                              model=EMBEDDING_MODEL)
+        for item in response.data:
+            computed[batch[item.index]] = item.embedding
+
+    batches = list(_embedding_batches([unique[i] for i in missing], max_items, max_tokens))
+    await map_concurrently(embed, batches, limit, rate_limiter,
+                           cost=lambda batch: sum(count_tokens(unique[missing[i]]) for i in batch))
+    if missing:
+        computed = np.asarray(computed, dtype=np.float32)
+        if vectors is None:
+            vectors = np.empty((len(unique), computed.shape[1]), dtype=np.float32)
+        vectors[missing] = computed
+        if cache:
+            cache.put_many(EMBEDDING_MODEL, [unique[i] for i in missing], computed)
+    if vectors is None:  # empty list
+        vectors = np.zeros((0, 0), dtype=np.float32)
+
+    if isinstance(data_input, str):
+        return vectors[0].tolist()
+    if as_matrix:
+        rows = {text: row for row, text in enumerate(unique)}
+        return vectors[[rows[text] for text in texts]]
+    return dict(zip(unique, vectors.tolist()))
+
+
 if __name__ == "__main__":
     #print("here are all functions that directly call openai.")
     #img_create("a skier in the swiss alps", download_path="skier.png")
@@ -1,63 +1,385 @@
+import contextlib
+import datetime
+import decimal
+import itertools
 import os
+import threading
+import time
+import uuid
+import weakref
+
 import psycopg2
+from psycopg2 import errors, extras, pool, sql
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = None
+_pool_config = {"minconn": 1, "maxconn": 10, "dsn": None, "health_check_after": 30.0}
+_last_used = weakref.WeakKeyDictionary()  # connection -> time it was opened or last returned to the pool
+
+SCHEMA_CACHE_TTL = 300.0
+_schema_cache = {}  # (schema or None, table) -> table info, see get_table_schema
+_schema_cache_lock = threading.Lock()
+
+
+class _ConnectionPool(pool.ThreadedConnectionPool):
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        _last_used[conn] = time.monotonic()  # a connection that was just opened needs no health check
+        return conn
+
+
+def configure_pool(minconn=1, maxconn=10, dsn=None, health_check_after=30.0):
+    """
+    Configure the module-level connection pool. An existing pool is closed and recreated on next use.
+
+    Parameters:
+        minconn (int): Connections opened up front and kept open.
+        maxconn (int): Upper bound; callers wait for a free connection beyond that.
+        dsn (str): Connection string, defaults to the NEON_URL environment variable.
+        health_check_after (float): Connections idle for longer than this many seconds are checked with
+            SELECT 1 before being handed out (Neon suspends idle computes and drops their connections).
+    """
+    close_pool()
+    _pool_config.update(minconn=minconn, maxconn=maxconn, dsn=dsn, health_check_after=health_check_after)
+
+
+def _get_pool():
+    global _pool, _pool_slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                dsn = _pool_config["dsn"] or os.environ.get('NEON_URL')
+                _pool_slots = threading.BoundedSemaphore(_pool_config["maxconn"])
+                _pool = _ConnectionPool(_pool_config["minconn"], _pool_config["maxconn"], dsn)
+    return _pool
+
+
+def close_pool():
+    """
+    Close all pooled connections.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    if time.monotonic() - _last_used.get(conn, 0.0) < _pool_config["health_check_after"]:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
 
 
-def write_to_db(table, data):
+@contextlib.contextmanager
+def get_connection():
+    """
+    Borrow a connection from the pool for the duration of a with block.
+
+    The transaction is committed when the block succeeds and rolled back when it raises. Broken connections
+    are discarded and replaced instead of being returned to the pool.
+    """
+    db_pool = _get_pool()
+    slots = _pool_slots
+    slots.acquire()
+    conn = None
+    try:
+        conn = db_pool.getconn()
+        # after a compute suspend every idle connection may be dead, so keep replacing until one works
+        for _ in range(_pool_config["maxconn"]):
+            if _is_healthy(conn):
+                break
+            db_pool.putconn(conn, close=True)
+            conn = db_pool.getconn()
+        yield conn
+        conn.commit()
+    except BaseException:
+        # BaseException also covers GeneratorExit, e.g. when a read_db generator is abandoned
+        if conn is not None and not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        if conn is not None:
+            _last_used[conn] = time.monotonic()
+            db_pool.putconn(conn, close=bool(conn.closed))
+        slots.release()
+
+
+def get_table_schema(table, cur=None, ttl=None):
+    """
+    Column metadata and ready-made statements for a table, cached per process.
+
+    The lookup is parameterized and scoped to the table's schema ('schema.table', or the connection's
+    current_schema() for a bare name). Entries expire after ttl seconds (SCHEMA_CACHE_TTL by default);
+    call invalidate_schema_cache after DDL changes.
+
+    Parameters:
+        table (str): 'table' or 'schema.table'.
+        cur: Cursor to use on a cache miss; a pooled connection is borrowed when None.
+        ttl (float): Maximum age of a cached entry in seconds.
+
+    Returns:
+        dict: schema, table, columns [(name, data_type)] in table order, insert_columns (without 'id'),
+            insert_sql (for executemany), values_sql (for execute_values) and copy_sql (for COPY FROM STDIN).
+    """
+    schema_name, _, table_name = table.rpartition('.')
+    key = (schema_name or None, table_name)
+    ttl = SCHEMA_CACHE_TTL if ttl is None else ttl
+    cached = _schema_cache.get(key)
+    if cached is not None and time.monotonic() - cached["loaded_at"] < ttl:
+        return cached
+
+    if cur is None:
+        with get_connection() as conn, conn.cursor() as cur:
+            return get_table_schema(table, cur, ttl)
+
+    cur.execute("SELECT table_schema, column_name, data_type FROM information_schema.columns "
+                "WHERE table_name = %s AND table_schema = COALESCE(%s, current_schema()) "
+                "ORDER BY ordinal_position", key[::-1])
+    rows = cur.fetchall()
+    if not rows:
+        raise ValueError(f"Table not found: {table}")
+
+    columns = [(name, data_type) for _, name, data_type in rows]
+    insert_columns = [name for name, _ in columns if name != 'id']  # Assuming 'id' is auto-increment and not needed in the insert
+    target = sql.SQL("{} ({})").format(sql.Identifier(rows[0][0], table_name),
+                                       sql.SQL(', ').join(map(sql.Identifier, insert_columns)))
+    info = {
+        "schema": rows[0][0],
+        "table": table_name,
+        "columns": columns,
+        "insert_columns": insert_columns,
+        "insert_sql": sql.SQL("INSERT INTO {} VALUES ({})").format(
+            target, sql.SQL(', ').join(sql.Placeholder() * len(insert_columns))).as_string(cur),
+        "values_sql": sql.SQL("INSERT INTO {} VALUES %s").format(target).as_string(cur),
+        "copy_sql": sql.SQL("COPY {} FROM STDIN WITH (FORMAT csv, NULL '\\N')").format(target).as_string(cur),
+        "loaded_at": time.monotonic(),
+    }
+    with _schema_cache_lock:
+        _schema_cache[key] = info
+    return info
+
+
+def invalidate_schema_cache(table=None):
+    """
+    Drop cached table metadata, for one table ('table' or 'schema.table') or for all tables.
+    """
+    with _schema_cache_lock:
+        if table is None:
+            _schema_cache.clear()
+            return
+        schema_name, _, table_name = table.rpartition('.')
+        for key in list(_schema_cache):
+            if key[1] == table_name and (not schema_name or schema_name in (key[0], _schema_cache[key]["schema"])):
+                del _schema_cache[key]
+
+
+def write_to_db(table, data, bulk=False):
     """
     Write data to the specified table in the database after fetching the column names.
 
     Parameters:
         table (str): The name of the table to write to.
         data (list of tuples): A list of tuples containing the data to insert, aligning with the table's columns.
+        bulk (bool): Stream the rows with COPY via bulk_write_to_db instead of a parameterized INSERT.
+            data may then be any iterable, e.g. a generator.
     """
-    connection_string = os.environ.get('NEON_URL')
-    conn = psycopg2.connect(connection_string)
-    cur = conn.cursor()
+    if bulk:
+        return bulk_write_to_db(table, data)
 
-    # Fetch column names from the table
-    cur.execute(f"SELECT column_name FROM information_schema.columns WHERE table_name = '{table}'")
-    columns = [row[0] for row in cur.fetchall() if row[0] != 'id']  # Assuming 'id' is auto-increment and not needed in the insert
+    with get_connection() as conn, conn.cursor() as cur:
+        # Column names and the INSERT statement come from the schema cache
+        query = get_table_schema(table, cur)["insert_sql"]
 
-    # Prepare the SQL command using the column names
-    columns_sql = ', '.join(columns)
-    placeholders = ', '.join(['%s'] * len(columns))
-    query = f"INSERT INTO {table} ({columns_sql}) VALUES ({placeholders})"
+        # Execute SQL commands to write to the database, get_connection commits
+        cur.executemany(query, data)
+    print("Records inserted successfully")
 
-    # Execute SQL commands to write to the database
-    cur.executemany(query, data)
 
-    # Commit the transaction
-    conn.commit()
+# values of these types are written by COPY exactly as psycopg2 would adapt them in an INSERT; chunks with
+# anything else (dicts, lists, numpy scalars, timedelta, subclasses, ...) go through execute_values
+_COPY_TYPES = {type(None), str, int, float, bool, decimal.Decimal, datetime.date, datetime.datetime,
+               datetime.time, uuid.UUID, bytes, bytearray, memoryview}
 
-    # Close the cursor and connection
-    cur.close()
-    conn.close()
-    print("Records inserted successfully")
+
+def _copy_field(value):
+    # every value is quoted, so only the unquoted \N marker means NULL (a string '\N' stays a string)
+    if value is None:
+        return '\\N'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        text = '\\x' + bytes(value).hex()
+    else:
+        text = str(value)
+    return '"' + text.replace('"', '""') + '"'
 
 
-def read_db(table, criteria='1=1'):
+class _CsvChunk:
+    """
+    Minimal file-like object for copy_expert that renders rows to CSV lazily, a few rows per read() call.
+    Only for rows whose values are all of _COPY_TYPES.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._pending = ''
+
+    def read(self, size=65536):
+        parts = [self._pending]
+        length = len(self._pending)
+        while length < size:
+            batch = list(itertools.islice(self._rows, 100))
+            if not batch:
+                break
+            text = ''.join(','.join(map(_copy_field, row)) + '\n' for row in batch)
+            parts.append(text)
+            length += len(text)
+        pending = ''.join(parts)
+        chunk, self._pending = pending[:size], pending[size:]
+        return chunk
+
+    readline = read
+
+
+def bulk_write_to_db(table, rows, chunk_rows=50_000, page_size=1000):
+    """
+    Stream rows into a table with COPY ... FROM STDIN in CSV format.
+
+    Rows are taken from the iterable in chunks of chunk_rows and each chunk is sent as its own COPY inside one
+    transaction, so only one chunk is ever held in memory. If the server refuses COPY on the first chunk
+    (e.g. behind a proxy that does not support it, or without the privilege), the rows are written with
+    execute_values instead. Chunks containing values COPY cannot render the way psycopg2 adapts them
+    (see _COPY_TYPES, e.g. dicts or lists) are also written with execute_values, so the stored data is
+    the same as with write_to_db(bulk=False).
+
+    Parameters:
+        table (str): The name of the table to write to.
+        rows (iterable of tuples): Rows aligning with the table's columns (without 'id').
+        chunk_rows (int): Rows per COPY command.
+        page_size (int): Rows per INSERT statement in the execute_values fallback.
+
+    Returns:
+        dict: rows, seconds, rows_per_second and method ('copy', 'execute_values' or 'copy+execute_values').
+    """
+    start = time.perf_counter()
+    rows = iter(rows)
+    count = 0
+    methods = set()
+    copy_refused = False
+    with get_connection() as conn, conn.cursor() as cur:
+        table_schema = get_table_schema(table, cur)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_rows))
+            if not chunk:
+                break
+            if not copy_refused and all(type(value) in _COPY_TYPES for row in chunk for value in row):
+                try:
+                    cur.copy_expert(table_schema["copy_sql"], _CsvChunk(chunk))
+                    methods.add('copy')
+                    count += len(chunk)
+                    continue
+                except (errors.FeatureNotSupported, errors.InsufficientPrivilege):
+                    if count:
+                        raise
+                    conn.rollback()
+                    copy_refused = True
+            extras.execute_values(cur, table_schema["values_sql"], chunk, page_size=page_size)
+            methods.add('execute_values')
+            count += len(chunk)
+
+    seconds = time.perf_counter() - start
+    method = '+'.join(sorted(methods)) or 'copy'
+    stats = {"rows": count, "seconds": seconds, "rows_per_second": count / seconds if seconds else 0.0,
+             "method": method}
+    print(f"Records inserted successfully: {count} rows in {seconds:.2f}s "
+          f"({stats['rows_per_second']:.0f} rows/s, {method})")
+    return stats
+
+
+def read_db(table, criteria='1=1', params=None, itersize=2000, batch_size=None, as_columns=False):
     """
     Read data from the specified table in the database based on criteria.
 
+    Rows are streamed through a named server-side cursor, itersize rows per round trip, so memory stays flat
+    regardless of the table size. The pooled connection is held until the generator is exhausted or closed.
+
     Parameters:
-        table (str): The name of the table to read from.
-        criteria (str): SQL criteria for filtering data (default is '1=1' which selects all).
+        table (str): The name of the table to read from ('table' or 'schema.table').
+        criteria (str): SQL criteria for filtering data (default is '1=1' which selects all). Use %s
+            placeholders and params for values, e.g. read_db('home', "name = %s", ("John",)).
+        params (tuple | dict): Values for the placeholders in criteria.
+        itersize (int): Rows fetched from the server per round trip.
+        batch_size (int): Yield lists of up to batch_size rows instead of single rows.
+        as_columns (bool): Yield one dict per batch mapping column name -> numpy array.
+
+    Returns:
+        generator: Rows as tuples, lists of rows with batch_size, or column dicts with as_columns.
     """
-    connection_string = os.environ.get('NEON_URL')
-    conn = psycopg2.connect(connection_string)
-    cur = conn.cursor()
+    query = sql.SQL("SELECT * FROM {} WHERE ").format(sql.Identifier(*table.split('.'))) + sql.SQL(criteria)
+    with get_connection() as conn:
+        with conn.cursor(name=f"read_db_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+            if batch_size is None and not as_columns:
+                yield from cur
+                return
 
-    # Execute a select statement to read the data
-    query = f"SELECT * FROM {table} WHERE {criteria}"
-    cur.execute(query)
-    rows = cur.fetchall()
+            if as_columns:
+                import numpy as np
+            while True:
+                rows = cur.fetchmany(batch_size or itersize)
+                if not rows:
+                    break
+                if as_columns:
+                    names = [column.name for column in cur.description]
+                    yield {name: np.asarray(values) for name, values in zip(names, zip(*rows))}
+                else:
+                    yield rows
 
-    for row in rows:
-        print(row)
 
-    # Close the cursor and connection
-    cur.close()
-    conn.close()
+def benchmark_connections(n=50, dsn=None):
+    """
+    Compare per-call latency of a fresh psycopg2.connect per call with the pool, using SELECT 1.
+
+    Parameters:
+        n (int): Calls per variant.
+        dsn (str): Connection string, e.g. of a local Postgres; defaults to NEON_URL.
+
+    Returns:
+        dict: Average milliseconds per call for "connect_per_call" and "pooled".
+    """
+    dsn = dsn or os.environ.get('NEON_URL')
+
+    start = time.perf_counter()
+    for _ in range(n):
+        conn = psycopg2.connect(dsn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+        conn.close()
+    connect_ms = (time.perf_counter() - start) * 1000 / n
+
+    configure_pool(dsn=dsn)
+    with get_connection():
+        pass  # open the pool outside the measurement
+    start = time.perf_counter()
+    for _ in range(n):
+        with get_connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+    pooled_ms = (time.perf_counter() - start) * 1000 / n
+
+    print(f"connect per call: {connect_ms:.2f} ms, pooled: {pooled_ms:.2f} ms")
+    return {"connect_per_call": connect_ms, "pooled": pooled_ms}
 
 
 def main():
@@ -66,19 +388,22 @@ def main():
 
     # Read all entries from the table
     print("Reading all entries from the database:")
-    read_db(table_name)
+    for row in read_db(table_name):
+        print(row)
 
     # Write new entries to the table
     write_to_db(table_name, data_to_insert)
 
     # Read specific entries from the table
     print("\nReading specific entries from the database:")
-    read_db(table_name, "name='John' AND pet='Dog'")
+    for row in read_db(table_name, "name = %s AND pet = %s", ("John", "Dog")):
+        print(row)
 
     print("")
     print("")
     print("")
-    read_db(table_name)
+    for row in read_db(table_name):
+        print(row)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+"""
+Local stand-in for the OpenAI API, used by test_my_openai.py and for the concurrency benchmark
+(python tests/fake_openai.py).
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    # answers /chat/completions and /embeddings after server.latency seconds,
+    # every server.rate_limit_every-th request gets a 429 with Retry-After: server.retry_after instead
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+            limited = self.server.rate_limit_every and self.server.requests % self.server.rate_limit_every == 0
+            if limited:
+                self.server.limited_at.append(time.monotonic())
+        try:
+            time.sleep(self.server.latency)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+        if limited:
+            payload, status = {"error": {"message": "rate limited", "type": "rate_limit_error"}}, 429
+        elif self.path.endswith("/embeddings"):
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            payload, status = {"object": "list", "model": body["model"],
+                               "data": [{"object": "embedding", "index": i, "embedding": [0.0] * 8}
+                                        for i in range(len(inputs))],
+                               "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)}}, 200
+        else:
+            payload, status = {"id": "fake", "object": "chat.completion", "created": 0, "model": body["model"],
+                               "choices": [{"index": 0, "finish_reason": "stop",
+                                            "message": {"role": "assistant", "content": "ok"}}],
+                               "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}}, 200
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429:
+            self.send_header("Retry-After", str(self.server.retry_after))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # the default backlog of 5 drops connections at high concurrency limits
+
+
+def start_fake_server(latency=0.1, rate_limit_every=0, retry_after=0):
+    """
+    Starts the fake API in a background thread; call shutdown() when done.
+    base_url is http://127.0.0.1:<server_port>/v1. requests, max_active (most requests in flight at once)
+    and limited_at (times of the 429 answers) are recorded on the server.
+    """
+    server = FakeOpenAIServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    server.latency = latency
+    server.rate_limit_every = rate_limit_every
+    server.retry_after = retry_after
+    server.requests = 0
+    server.active = 0
+    server.max_active = 0
+    server.limited_at = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def benchmark_concurrency(my_openai, n_prompts=200, limits=(1, 4, 16, 64), latency=0.1, rate_limit_every=20):
+    """
+    Runs my_openai.gpt4_new_async over n_prompts against the fake server for several concurrency limits.
+    Returns one dict with limit, seconds and requests_per_second per limit.
+    """
+    server = start_fake_server(latency, rate_limit_every)
+    previous_options = my_openai._async_client_options
+    my_openai._async_client_options = {"base_url": f"http://127.0.0.1:{server.server_port}/v1", "api_key": "fake"}
+    results = []
+    try:
+        for limit in limits:
+            start = time.perf_counter()
+            asyncio.run(my_openai.map_concurrently(lambda prompt: my_openai.gpt4_new_async(prompt, use_cache=False),
+                                                   [f"prompt {i}" for i in range(n_prompts)], limit,
+                                                   my_openai.TokenBucket(rpm=100_000, tpm=10_000_000)))
+            seconds = time.perf_counter() - start
+            results.append({"limit": limit, "seconds": seconds, "requests_per_second": n_prompts / seconds})
+    finally:
+        my_openai._async_client_options = previous_options
+        server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    import my_openai
+    for row in benchmark_concurrency(my_openai):
+        print(f"limit={row['limit']:>3} {row['seconds']:.2f}s {row['requests_per_second']:.0f} req/s")
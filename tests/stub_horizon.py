@@ -0,0 +1,71 @@
+"""
+Local stand-in for the auth0 token endpoint and a paginated Horizon resource, used by test_ecodomus.py.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubHorizonHandler(BaseHTTPRequestHandler):
+    # /oauth/token hands out numbered tokens valid for server.expires_in seconds,
+    # /items?page=&pageSize= pages through server.n_items records and requires a valid token
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if body.get("grant_type") != "client_credentials" or "client_name" not in body:
+            return self._send(400, {"error": "invalid_request"})
+        with self.server.lock:
+            self.server.token_requests += 1
+            token = f"token-{self.server.token_requests}"
+            self.server.tokens[token] = time.monotonic() + self.server.expires_in
+        self._send(200, {"access_token": token, "expires_in": self.server.expires_in, "token_type": "Bearer"})
+
+    def do_GET(self):
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        with self.server.lock:
+            self.server.used_tokens.append(token)
+            valid = self.server.tokens.get(token, 0) >= time.monotonic()
+        if not valid:
+            return self._send(401, {"error": "invalid_token"})
+        query = parse_qs(urlparse(self.path).query)
+        page, size = int(query["page"][0]), int(query["pageSize"][0])
+        time.sleep(self.server.latency)
+        start = (page - 1) * size
+        body = {"data": [{"id": i} for i in range(start, min(start + size, self.server.n_items))]}
+        if self.server.report_total:
+            body["meta"] = {"total": self.server.n_items}
+        self._send(200, body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(n_items=1000, expires_in=3600, latency=0.0, report_total=True):
+    """
+    Starts the stub in a background thread; call shutdown() when done. base_url is
+    http://127.0.0.1:<server_port>, the token endpoint <base_url>/oauth/token. Clearing server.tokens
+    revokes all tokens handed out so far.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHorizonHandler)
+    server.daemon_threads = True
+    server.n_items = n_items
+    server.expires_in = expires_in
+    server.latency = latency
+    server.report_total = report_total
+    server.token_requests = 0
+    server.tokens = {}
+    server.used_tokens = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import completion_cache
+
+
+@pytest.fixture
+def cache():
+    return completion_cache.CompletionCache()
+
+
+def test_concurrent_threads_share_one_call(cache):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return "answer"
+
+    key = cache.key("m", [{"role": "user", "content": "x"}])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute(key, compute)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["answer"] * 8
+    assert len(calls) == 1
+    assert cache.stats()["misses"] == 1 and cache.stats()["coalesced"] == 7
+    assert cache.get_or_compute(key, compute) == "answer"
+    assert cache.stats()["hits"] == 1
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call(cache):
+    key = cache.key("m", [{"role": "user", "content": "x"}])
+
+    async def compute():
+        await asyncio.sleep(0.2)
+        return "answer"
+
+    async def impatient():
+        return await asyncio.wait_for(cache.get_or_compute_async(key, compute), timeout=0.05)
+
+    async def run():
+        owner = asyncio.create_task(cache.get_or_compute_async(key, compute))
+        await asyncio.sleep(0)
+        waiter1 = asyncio.create_task(cache.get_or_compute_async(key, compute))
+        timed_out = asyncio.create_task(impatient())
+        waiter2 = asyncio.create_task(cache.get_or_compute_async(key, compute))
+        return await asyncio.gather(owner, waiter1, timed_out, waiter2, return_exceptions=True)
+
+    owner, waiter1, timed_out, waiter2 = asyncio.run(run())
+
+    assert isinstance(timed_out, asyncio.TimeoutError)
+    assert owner == waiter1 == waiter2 == "answer"
+    assert cache.get(key) == "answer"
+    assert not cache._inflight
+
+
+def test_cancelled_owner_does_not_cancel_the_shared_call(cache):
+    key = cache.key("m", [{"role": "user", "content": "x"}])
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "answer"
+
+    async def run():
+        owner = asyncio.create_task(asyncio.wait_for(cache.get_or_compute_async(key, compute), timeout=0.05))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute_async(key, compute))
+        return await asyncio.gather(owner, waiter, return_exceptions=True)
+
+    owner, waiter = asyncio.run(run())
+
+    assert isinstance(owner, asyncio.TimeoutError)
+    assert waiter == "answer"
+    assert len(calls) == 1
+    assert cache.get(key) == "answer"
+    assert not cache._inflight
+
+
+def test_failure_is_shared_and_not_cached(cache):
+    async def compute():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream failed")
+
+    async def run():
+        tasks = [asyncio.create_task(cache.get_or_compute_async("k", compute)) for _ in range(3)]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("k") is None
+    assert not cache._inflight
+
+
+def test_use_cache_false_bypasses_the_cache(cache):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "answer"
+
+    for _ in range(2):
+        completion_cache.cached_completion("m", [], compute, use_cache=False, cache=cache)
+    completion_cache.cached_completion("m", [], compute, cache=cache)
+    completion_cache.cached_completion("m", [], compute, cache=cache)
+
+    assert len(calls) == 3
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+import ecodomus  # noqa: E402
+from stub_horizon import start_stub_server  # noqa: E402
+
+
+@pytest.fixture
+def horizon():
+    servers, clients = [], []
+
+    def start(refresh_margin=60, **server_options):
+        server = start_stub_server(**server_options)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        client = ecodomus.HorizonClient(ecodomus.CLIENT_ID, "secret", base_url=base_url,
+                                        token_url=f"{base_url}/oauth/token", refresh_margin=refresh_margin)
+        servers.append(server)
+        clients.append(client)
+        return client, server
+
+    yield start
+    for client in clients:
+        client.close()
+    for server in servers:
+        server.shutdown()
+
+
+def test_token_is_reused(horizon):
+    client, server = horizon(n_items=10)
+
+    for _ in range(5):
+        client.get("/items", {"page": 1, "pageSize": 5})
+
+    assert server.token_requests == 1
+    assert set(server.used_tokens) == {"token-1"}
+
+
+def test_token_is_refreshed_in_the_background(horizon):
+    client, server = horizon(n_items=10, expires_in=1, refresh_margin=0.5)
+    client.get("/items", {"page": 1, "pageSize": 5})
+
+    time.sleep(0.8)  # the timer fires 0.5s after the first token was issued
+    assert server.token_requests == 2
+
+    client.get("/items", {"page": 1, "pageSize": 5})
+    assert server.token_requests == 2
+    assert server.used_tokens == ["token-1", "token-2"]
+
+
+def test_request_is_retried_with_a_new_token_after_401(horizon):
+    client, server = horizon(n_items=10)
+    client.get("/items", {"page": 1, "pageSize": 5})
+    server.tokens.clear()  # revoke token-1
+
+    body = client.get("/items", {"page": 1, "pageSize": 5})
+
+    assert len(body["data"]) == 5
+    assert server.used_tokens == ["token-1", "token-1", "token-2"]
+
+
+@pytest.mark.parametrize("report_total", [True, False])
+@pytest.mark.parametrize("n_items", [0, 7, 200, 251])
+def test_get_all_returns_pages_in_order(horizon, report_total, n_items):
+    client, server = horizon(n_items=n_items, report_total=report_total, latency=0.01)
+
+    items = client.get_all("/items", page_size=20, max_workers=4)
+
+    assert [item["id"] for item in items] == list(range(n_items))
+
+
+def test_total_pages_ignores_count():
+    assert ecodomus._total_pages({"data": [], "count": 20}, 20) is None
+    assert ecodomus._total_pages({"data": [], "meta": {"total": 41}}, 20) == 3
+    assert ecodomus._total_pages({"data": [], "totalPages": 5}, 20) == 5
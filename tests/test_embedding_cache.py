@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import embedding_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = embedding_cache.EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    yield cache
+    cache.close()
+
+
+def test_get_many_returns_matrix_and_missing_positions(cache):
+    vectors = np.arange(12, dtype=np.float32).reshape(3, 4)
+    cache.put_many("m", ["a", "b", "c"], vectors)
+
+    matrix, missing = cache.get_many("m", ["c", "x", "a", "c"])
+
+    assert matrix.dtype == np.float32
+    assert missing == [1]
+    np.testing.assert_array_equal(matrix[[0, 2, 3]], vectors[[2, 0, 2]])
+    assert cache.get_many("m", ["x"]) == (None, [0])
+    assert cache.stats()["hits"] == 3
+
+
+def test_cached_embeddings_computes_only_misses(cache):
+    computed = []
+
+    def compute(texts):
+        computed.append(list(texts))
+        return np.full((len(texts), 2), len(computed), dtype=np.float32)
+
+    first = embedding_cache.cached_embeddings("m", ["a", "b"], compute, cache)
+    second = embedding_cache.cached_embeddings("m", ["b", "c", "a"], compute, cache)
+
+    assert computed == [["a", "b"], ["c"]]
+    np.testing.assert_array_equal(second, [[1, 1], [2, 2], [1, 1]])
+    np.testing.assert_array_equal(first, [[1, 1], [1, 1]])
+
+
+def test_key_keeps_surrounding_whitespace(cache):
+    assert cache.key(" a ") != cache.key("a")
+    assert cache.key("Cafe\u0301") == cache.key("Caf\u00e9")
+
+
+def test_old_format_is_rebuilt(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    conn = embedding_cache.sqlite3.connect(path)
+    conn.execute("CREATE TABLE embeddings (model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, "
+                 "last_used REAL NOT NULL, PRIMARY KEY (model, key)) WITHOUT ROWID")
+    conn.close()
+
+    cache = embedding_cache.EmbeddingCache(path)
+    cache.put("m", "a", [1.0, 2.0])
+    np.testing.assert_array_equal(cache.get("m", "a"), [1.0, 2.0])
+    cache.close()
@@ -0,0 +1,119 @@
+import pytest
+
+pytest.importorskip("ifcopenshell")
+import ifcopenshell  # noqa: E402
+
+from conftest import load_module  # noqa: E402
+
+ifc_checker = load_module("IFC-checker.py", "ifc_checker")
+
+IFC4_DEFINITION_SET = """ISO-10303-21;
+HEADER;
+FILE_DESCRIPTION((''),'2;1');
+FILE_NAME('set.ifc','',(''),(''),'','','');
+FILE_SCHEMA(('IFC4'));
+ENDSEC;
+DATA;
+#1=IFCWALL('0abcdefghijklmnopqrstu',$,'Wand',$,$,$,$,$,$);
+#2=IFCPROPERTYSINGLEVALUE('FireRating',$,IFCLABEL('EI60'),$);
+#3=IFCPROPERTYSET('1abcdefghijklmnopqrstu',$,'Pset_WallCommon',$,(#2));
+#4=IFCPROPERTYSET('2abcdefghijklmnopqrstu',$,'Pset_Custom',$,(#2));
+#5=IFCRELDEFINESBYPROPERTIES('3abcdefghijklmnopqrstu',$,$,$,(#1),IFCPROPERTYSETDEFINITIONSET((#3,#4)));
+ENDSEC;
+END-ISO-10303-21;
+"""
+
+
+@pytest.fixture
+def definition_set_file(tmp_path):
+    path = tmp_path / "set.ifc"
+    path.write_text(IFC4_DEFINITION_SET)
+    return str(path)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (3, [3]),
+    ([3, 4], [3, 4]),
+    (("IFCPROPERTYSETDEFINITIONSET", [[3, 4]]), [3, 4]),
+])
+def test_definition_ids(value, expected):
+    assert ifc_checker._definition_ids(value) == expected
+
+
+def _comment_in_header(text):
+    return text.replace("HEADER;\n", "HEADER;\n/* it's exported; by hand */\n")
+
+
+def _data_on_one_line(text):
+    header, data = text.split("DATA;\n")
+    records, footer = data.split("ENDSEC;\n", 1)
+    return header + "DATA;\n" + records.replace(";\n", "; ") + "\nENDSEC;\n" + footer
+
+
+@pytest.mark.parametrize("layout", [lambda text: text, _comment_in_header, _data_on_one_line],
+                         ids=["plain", "comment_in_header", "data_on_one_line"])
+def test_scan_ifc_definition_set_matches_full_index(tmp_path, layout):
+    path = tmp_path / "set.ifc"
+    path.write_text(layout(IFC4_DEFINITION_SET))
+    streamed = ifc_checker.scan_ifc(str(path))
+    loaded = ifc_checker.IfcPropertyIndex(ifcopenshell.open(str(path)))
+
+    assert streamed.psets["IfcWall"] == {"Pset_WallCommon", "Pset_Custom"}
+    assert streamed.psets == loaded.psets
+    assert streamed.element_counts == loaded.element_counts
+    assert streamed.pset_properties == loaded.pset_properties
+
+
+def test_index_cache_rebuilds_tables_of_an_older_format(tmp_path, definition_set_file):
+    cache_path = str(tmp_path / "ifc_index.sqlite")
+    conn = ifc_checker.sqlite3.connect(cache_path)
+    # element_types ohne count-Spalte und ohne user_version, wie vor dem Typ-Histogramm
+    conn.executescript(ifc_checker._CACHE_SCHEMA.replace(", count INTEGER NOT NULL", ""))
+    conn.close()
+
+    cache = ifc_checker.IfcIndexCache(cache_path)
+    first = cache.load(definition_set_file)
+    second = cache.load(definition_set_file)
+    cache.close()
+
+    assert second.element_counts == first.element_counts == {
+        "IfcWall": 1, "IfcPropertySingleValue": 1, "IfcPropertySet": 2, "IfcRelDefinesByProperties": 1}
+    assert second.psets == first.psets
+
+
+def test_index_cache_eviction_prunes_files(tmp_path, definition_set_file):
+    cache = ifc_checker.IfcIndexCache(str(tmp_path / "ifc_index.sqlite"), max_bytes=0)
+    cache.load(definition_set_file)
+    counts = [cache.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("models", "files")]
+    cache.close()
+
+    assert counts == [0, 0]
+
+
+def test_clean_ifc_model_copies_definition_set(definition_set_file):
+    new_model, stats = ifc_checker.clean_ifc_model(ifcopenshell.open(definition_set_file))
+
+    rels = new_model.by_type("IfcRelDefinesByProperties")
+    psets = [rel.RelatingPropertyDefinition for rel in rels]
+    assert sorted(pset.Name for pset in psets) == ["Pset_Custom", "Pset_WallCommon"]
+    assert all(pset == new_model.by_id(pset.id()) for pset in psets)
+    assert len(new_model.by_type("IfcPropertySet")) == 2
+    assert len({rel.GlobalId for rel in rels}) == 2
+    assert [rel.RelatedObjects for rel in rels] == [tuple(new_model.by_type("IfcWall"))] * 2
+    assert stats["types"] == ["IfcWall"]
+
+
+def test_batch_worker_keeps_stdout_clean(tmp_path, definition_set_file, capsys):
+    other = tmp_path / "other.ifc"
+    other.write_text(IFC4_DEFINITION_SET.replace("'Pset_Custom'", "'Pset_Other'"))
+    reference_model = ifcopenshell.open(definition_set_file)
+    ifc_checker._init_batch_worker((ifc_checker.IfcPropertyIndex(reference_model),
+                                    ifc_checker.count_structure(reference_model)))
+
+    result = ifc_checker._compare_with_reference(str(other))
+
+    assert "error" not in result
+    assert result["requests_made"] < 2
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "Error retrieving property value" in captured.err
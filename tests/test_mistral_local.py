@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")
+import mistral_local  # noqa: E402
+
+
+class FakeCompletions:
+    def __init__(self, usage):
+        self.usage = usage
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word))], usage=None)
+                  for word in ("Hello", " there")]
+        if self.usage:
+            chunks.append(SimpleNamespace(choices=[], usage=SimpleNamespace(**self.usage)))
+        return iter(chunks)
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    def install(usage):
+        fake = FakeCompletions(usage)
+        monkeypatch.setattr(mistral_local, "client", SimpleNamespace(chat=SimpleNamespace(completions=fake)))
+        return fake
+    return install
+
+
+def test_ask_reports_server_usage(completions):
+    fake = completions({"prompt_tokens": 42, "completion_tokens": 2})
+    conversation = mistral_local.ConversationManager("system")
+
+    assert conversation.ask("hi", print_out=False) == "Hello there"
+    assert fake.requests[0]["stream_options"] == {"include_usage": True}
+    stats = conversation.stats[-1]
+    assert (stats["prompt_tokens"], stats["completion_tokens"], stats["estimated"]) == (42, 2, False)
+    assert stats["ttft"] is not None
+
+
+def test_ask_estimates_tokens_without_usage(completions):
+    completions(None)
+    conversation = mistral_local.ConversationManager("system")
+
+    conversation.ask("hi", print_out=False)
+
+    stats = conversation.stats[-1]
+    assert stats["estimated"] is True
+    assert stats["completion_tokens"] == mistral_local.estimate_tokens("Hello there")
+
+
+def test_history_stays_within_budget_and_keeps_system_prompt(completions):
+    completions(None)
+    conversation = mistral_local.ConversationManager("system", max_tokens=300, reserve_tokens=100)
+
+    for i in range(30):
+        conversation.ask("question " * 20 + str(i), print_out=False)
+
+    assert conversation.messages()[0] == {"role": "system", "content": "system"}
+    assert conversation.turns[0]["role"] == "user"
+    assert max(stats["prompt_tokens"] for stats in conversation.stats) <= 200
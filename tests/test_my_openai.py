@@ -0,0 +1,116 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+pytest.importorskip("openai")
+os.environ.setdefault("OPENAI_API_KEY", "fake")
+import my_openai  # noqa: E402
+from fake_openai import start_fake_server  # noqa: E402
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    servers = []
+
+    def start(**kwargs):
+        server = start_fake_server(**kwargs)
+        servers.append(server)
+        monkeypatch.setattr(my_openai, "_async_client_options",
+                            {"base_url": f"http://127.0.0.1:{server.server_port}/v1", "api_key": "fake"})
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def complete(prompt):
+    return my_openai.gpt4_new_async(prompt, use_cache=False)
+
+
+def test_map_concurrently_keeps_at_most_limit_requests_in_flight(fake_api):
+    server = fake_api(latency=0.05)
+
+    results = asyncio.run(my_openai.map_concurrently(complete, [f"p{i}" for i in range(20)], limit=4))
+
+    assert results == ["ok"] * 20
+    assert server.max_active == 4
+
+
+def test_map_concurrently_retries_429_after_retry_after(fake_api):
+    server = fake_api(latency=0.01, rate_limit_every=2, retry_after=0.3)
+    start = time.monotonic()
+
+    results = asyncio.run(my_openai.map_concurrently(complete, ["p0", "p1", "p2"], limit=1))
+
+    # p0 ok, p1 429 then ok, p2 429 then ok
+    assert results == ["ok"] * 3
+    assert server.requests == 5
+    assert len(server.limited_at) == 2
+    # both retries waited at least Retry-After (plus up to 1s jitter)
+    assert time.monotonic() - start >= 2 * 0.3
+
+
+def test_map_concurrently_gives_up_after_max_retries(fake_api):
+    fake_api(latency=0.0, rate_limit_every=1)
+
+    with pytest.raises(my_openai.RateLimitError):
+        asyncio.run(my_openai.map_concurrently(complete, ["p"], limit=1, max_retries=2))
+
+
+def test_token_bucket_paces_tokens_per_minute():
+    async def run():
+        bucket = my_openai.TokenBucket(rpm=1_000_000, tpm=600)  # 10 tokens per second, burst of 600
+        start = time.monotonic()
+        await bucket.acquire(600)
+        burst = time.monotonic() - start
+        await bucket.acquire(3)
+        await bucket.acquire(3)
+        return burst, time.monotonic() - start
+
+    burst, total = asyncio.run(run())
+
+    assert burst < 0.05
+    assert 0.55 <= total < 0.9
+
+
+def test_token_bucket_paces_requests_per_minute():
+    async def run():
+        bucket = my_openai.TokenBucket(rpm=1200, tpm=10_000_000)  # 20 requests per second
+        for _ in range(1200):
+            await bucket.acquire()
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    assert 0.2 <= asyncio.run(run()) < 0.45
+
+
+class ShortReads:
+    # file object whose read() returns at most a few bytes, like a raw stream or socket
+    def __init__(self, data, step=7):
+        self.data = data
+        self.step = step
+
+    def read(self, size=-1):
+        chunk, self.data = self.data[:min(size, self.step)], self.data[min(size, self.step):]
+        return chunk
+
+
+@pytest.mark.parametrize("length", [0, 1, 2, 3, 100, 1000])
+def test_encode_image_handles_short_reads(length):
+    data = bytes(range(256)) * 4
+    data = data[:length]
+
+    assert my_openai.encode_image(ShortReads(data)) == my_openai.base64.b64encode(data).decode()
+
+
+def test_encode_image_files_match_plain_base64(tmp_path, monkeypatch):
+    monkeypatch.setattr(my_openai, "IMAGE_CHUNK_SIZE", 30)
+    path = tmp_path / "image.bin"
+    path.write_bytes(bytes(range(256)) * 3 + b"x")
+
+    assert my_openai.image_to_base64(str(path)) == my_openai.base64.b64encode(path.read_bytes()).decode()
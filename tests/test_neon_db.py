@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+import neon_db  # noqa: E402
+
+
+def read_all(chunk, size=5):
+    parts = []
+    for part in iter(lambda: chunk.read(size), ''):
+        parts.append(part)
+    return ''.join(parts)
+
+
+def test_csv_chunk_quotes_values_so_only_none_is_null():
+    rows = [(None, '\\N', 'a"b,c', b'\x00\xff', ''), (1, 2.5, True, None, 'x')]
+
+    text = read_all(neon_db._CsvChunk(rows))
+
+    assert text == ('\\N,"\\N","a""b,c","\\x00ff",""\n'
+                    '"1","2.5","True",\\N,"x"\n')
+
+
+def test_only_plain_values_are_copied():
+    assert all(type(value) in neon_db._COPY_TYPES for value in (None, 'a', 1, 1.5, b'', True))
+    assert type({"a": 1}) not in neon_db._COPY_TYPES
+    assert type([1, 2]) not in neon_db._COPY_TYPES